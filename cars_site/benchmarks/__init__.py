@@ -0,0 +1,61 @@
+"""Benchmarks of the cars app.
+
+Run from the `cars_site` directory, e.g. `python -m benchmarks.serializers`.
+"""
+
+import os
+import random
+import timeit
+
+import django
+
+
+def setup_django(test_database=True):
+    """Set up Django, by default with a fresh test database."""
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cars_site.settings")
+    django.setup()
+
+    if test_database:
+        from django.db import connection
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0)
+
+
+MANUFACTURERS = ["Volkswagen", "Toyota", "Ford", "Skoda", "Audi", "BMW", "Kia"]
+
+
+def create_cars(number):
+    """Create cars with random, but repeatable, attributes."""
+
+    from cars_app.models import Car, CarCategoryChoices, MotorTypeChoices
+
+    generator = random.Random(0)
+    Car.objects.bulk_create(
+        (
+            Car(
+                registration_number=f"BEN-{i}",
+                max_passengers=generator.randint(1, 9),
+                year_of_manufacture=generator.randint(1990, 2020),
+                manufacturer=generator.choice(MANUFACTURERS),
+                model="Model",
+                category=generator.choice(CarCategoryChoices.values),
+                motor_type=generator.choice(MotorTypeChoices.values),
+            )
+            for i in range(number)
+        ),
+        batch_size=5000,
+    )
+
+
+def measure(function, number):
+    """Get the best time of a single call in microseconds, out of 5 repeats."""
+
+    timer = timeit.Timer(function)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def report(name, microseconds):
+    print(f"{name:<60} {microseconds:>10.1f} us")
@@ -0,0 +1,76 @@
+"""car:batch compared to the same operations sent as separate requests.
+
+Every round retrieves a car, updates it and deletes another one.
+"""
+
+import itertools
+
+from benchmarks import create_cars, measure, report, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from cars_app.models import Car  # noqa: E402
+
+ROUNDS = 500
+
+
+def separate_requests(client, car_id, deleted_id):
+    client.get("/car:retrieve", {"id": car_id})
+    client.post(
+        "/car:update",
+        data={"pk": car_id, "max_passengers": 4},
+        content_type="application/json",
+    )
+    client.post("/car:delete", data={"pk": deleted_id}, content_type="application/json")
+
+
+def single_batch(client, car_id, deleted_id):
+    response = client.post(
+        "/car:batch",
+        data={
+            "operations": [
+                {"operation": "retrieve", "params": {"id": car_id}},
+                {"operation": "update", "data": {"pk": car_id, "max_passengers": 4}},
+                {"operation": "delete", "data": {"pk": deleted_id}},
+            ]
+        },
+        content_type="application/json",
+    )
+    assert response.status_code == 200, response.content
+
+
+def main():
+    # Every round deletes a car, so there are enough of them for all repeats.
+    create_cars(ROUNDS * 2 * 5 + 1)
+    client = Client()
+    car_id = Car.objects.order_by("id").values_list("id", flat=True).first()
+    deleted_ids = iter(
+        Car.objects.exclude(id=car_id).values_list("id", flat=True).order_by("id")
+    )
+
+    # The write rate limits are not measured.
+    throttle_rates = {
+        scope: None for scope in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+    }
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": throttle_rates,
+    }
+
+    for name, function in [
+        ("3 separate requests", separate_requests),
+        ("single car:batch request", single_batch),
+    ]:
+        ids = itertools.islice(deleted_ids, ROUNDS * 5)
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            microseconds = measure(
+                lambda: function(client, car_id, next(ids)), number=ROUNDS
+            )
+        report(name, microseconds)
+
+
+if __name__ == "__main__":
+    main()
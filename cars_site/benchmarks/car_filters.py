@@ -0,0 +1,67 @@
+"""car:list with lists of values and ranges compared to separate requests.
+
+Before `__in` and `__range` lookups, clients asked for each manufacturer separately,
+with only the lower bound of passengers, and merged the results on their side.
+"""
+
+import sys
+
+from benchmarks import create_cars, measure, report, setup_django
+
+setup_django()
+
+from django.test import Client  # noqa: E402
+
+CARS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+MANUFACTURERS = ["Toyota", "Ford", "Kia"]
+MIN_PASSENGERS, MAX_PASSENGERS = 4, 7
+
+
+def single_request(client):
+    return client.get(
+        "/car:list",
+        data={
+            "manufacturer__in": ",".join(MANUFACTURERS),
+            "max_passengers__range": f"{MIN_PASSENGERS},{MAX_PASSENGERS}",
+            "format": "compact",
+        },
+    ).json()["rows"]
+
+
+def separate_requests(client):
+    rows = []
+    for manufacturer in MANUFACTURERS:
+        response = client.get(
+            "/car:list",
+            data={
+                "manufacturer": manufacturer,
+                "max_passengers__gt": MIN_PASSENGERS - 1,
+                "format": "compact",
+            },
+        ).json()
+        max_passengers = response["fields"].index("max_passengers")
+        rows.extend(
+            row for row in response["rows"] if row[max_passengers] <= MAX_PASSENGERS
+        )
+    return sorted(rows)
+
+
+def main():
+    create_cars(CARS)
+    client = Client()
+
+    rows = len(single_request(client))
+    assert rows == len(separate_requests(client))
+
+    report(
+        f"{len(MANUFACTURERS)} requests merged by client ({rows} of {CARS})",
+        measure(lambda: separate_requests(client), number=3),
+    )
+    report(
+        f"single request with __in and __range ({rows} of {CARS})",
+        measure(lambda: single_request(client), number=3),
+    )
+
+
+if __name__ == "__main__":
+    main()
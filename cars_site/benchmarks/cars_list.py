@@ -0,0 +1,56 @@
+"""Filtering of cars in the database and in the in-memory snapshot."""
+
+import sys
+
+from benchmarks import create_cars, measure, report, setup_django
+
+setup_django()
+
+from cars_app.models import Car  # noqa: E402
+from cars_app.snapshot import fleet_snapshot  # noqa: E402
+
+CARS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+FIELDS = ["id", "registration_number", "manufacturer", "model"]
+
+CASES = [
+    ("manufacturer", {"manufacturer": "Toyota"}),
+    (
+        "manufacturer + max_passengers",
+        {"manufacturer": "Toyota", "max_passengers": 5},
+    ),
+    (
+        "year range + max_passengers__gt",
+        {
+            "year_of_manufacture__gt": 2015,
+            "year_of_manufacture__lt": 2018,
+            "max_passengers__gt": 6,
+        },
+    ),
+]
+
+
+def main():
+    create_cars(CARS)
+    fleet_snapshot.filter({}, FIELDS)
+
+    for name, filters in CASES:
+        rows = len(fleet_snapshot.filter(filters, FIELDS))
+        report(
+            f"{name} ({rows} of {CARS}): database",
+            measure(
+                lambda: list(Car.objects.filter(**filters).values_list(*FIELDS)),
+                number=5,
+            ),
+        )
+        report(
+            f"{name} ({rows} of {CARS}): snapshot",
+            measure(lambda: fleet_snapshot.filter(filters, FIELDS), number=5),
+        )
+        report(
+            f"{name} ({rows} of {CARS}): snapshot ids",
+            measure(lambda: fleet_snapshot.filter(filters, ["id"]), number=5),
+        )
+
+
+if __name__ == "__main__":
+    main()
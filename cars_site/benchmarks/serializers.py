@@ -0,0 +1,81 @@
+"""Construction and validation time of the car serializers."""
+
+from benchmarks import measure, report, setup_django
+
+setup_django()
+
+from rest_framework.serializers import ModelSerializer  # noqa: E402
+
+from cars_app.models import Car  # noqa: E402
+from cars_app.serializers import (  # noqa: E402
+    CarUpdateSerializer,
+    GeneralCarSerializer,
+)
+
+
+class StubInfoApi:
+    @staticmethod
+    def get_manufacturer_models(manufacturer):
+        return ["Golf", "Passat"]
+
+
+class UncachedGeneralCarSerializer(GeneralCarSerializer):
+    """Serializer building its fields from the model, as before they were cached."""
+
+    def get_fields(self):
+        return ModelSerializer.get_fields(self)
+
+
+class UncachedCarUpdateSerializer(UncachedGeneralCarSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field_name, field in self.fields.items():
+            if field_name != "pk":
+                field.required = False
+
+
+CAR_DATA = {
+    "registration_number": "KNS-123",
+    "max_passengers": 4,
+    "year_of_manufacture": 2000,
+    "model": "Golf",
+    "manufacturer": "Volkswagen",
+    "category": "economy",
+    "motor_type": "electric",
+}
+UPDATE_DATA = {"pk": 1, "max_passengers": 5, "year_of_manufacture": 2001}
+
+
+def main():
+    info_api = StubInfoApi()
+    instance = Car(pk=1)
+
+    cases = [
+        (
+            "add",
+            lambda cls: cls(info_api, data=CAR_DATA),
+            GeneralCarSerializer,
+            UncachedGeneralCarSerializer,
+        ),
+        (
+            "update",
+            lambda cls: cls(info_api, instance=instance, data=UPDATE_DATA),
+            CarUpdateSerializer,
+            UncachedCarUpdateSerializer,
+        ),
+    ]
+
+    for name, construct, cached_cls, uncached_cls in cases:
+        for label, cls in [("uncached", uncached_cls), ("cached", cached_cls)]:
+            report(
+                f"{name}: construction + fields ({label})",
+                measure(lambda: construct(cls).fields, number=2000),
+            )
+            report(
+                f"{name}: construction + validation ({label})",
+                measure(lambda: construct(cls).is_valid(), number=500),
+            )
+
+
+if __name__ == "__main__":
+    main()
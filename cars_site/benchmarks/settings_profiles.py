@@ -0,0 +1,83 @@
+"""Worker boot time and per-request overhead of the settings profiles.
+
+Every measurement runs in a new process with the given settings module, e.g.
+`python -m benchmarks.settings_profiles`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import report
+
+PROFILES = ["cars_site.settings", "cars_site.settings_api"]
+BOOTS = 5
+
+
+def measure_boot():
+    """Time of loading the WSGI application and its URL configuration, in us."""
+
+    started = time.perf_counter()
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    get_wsgi_application()
+    get_resolver(settings.ROOT_URLCONF).url_patterns
+    return (time.perf_counter() - started) * 1e6
+
+
+def measure_requests():
+    """Times of requests to the cars endpoints handled by the full stack, in us."""
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test import Client, override_settings
+
+    from benchmarks import create_cars, measure
+
+    connection.creation.create_test_db(verbosity=0)
+    create_cars(100)
+    client = Client()
+
+    # DEBUG of the profile is kept, unlike in tests.
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        return {
+            "car:retrieve": measure(
+                lambda: client.get("/car:retrieve", {"id": 1}), number=500
+            ),
+            "car:list (100 cars)": measure(
+                lambda: client.get("/car:list", {"format": "compact"}), number=200
+            ),
+        }
+
+
+def run(profile, function):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.settings_profiles", function],
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": profile},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    for profile in PROFILES:
+        boot = min(run(profile, "measure_boot") for _ in range(BOOTS))
+        report(f"{profile}: boot", boot)
+        for name, microseconds in run(profile, "measure_requests").items():
+            report(f"{profile}: {name}", microseconds)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(json.dumps(globals()[sys.argv[1]]()))
+    else:
+        main()
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CarsAppConfig(AppConfig):
     name = 'cars_app'
+
+    def ready(self):
+        # Connect receivers keeping the cars snapshot up to date and recording events.
+        from . import events, snapshot  # noqa: F401
+
+        if settings.CARS_WARM_CATALOG_ON_STARTUP:
+            from .catalog import warm_catalog_in_background
+            from .views import info_api
+
+            warm_catalog_in_background(info_api)
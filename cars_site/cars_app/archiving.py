@@ -0,0 +1,63 @@
+"""Moving of cars from the Car table to the ArchivedCar one.
+
+The Car table holds only the active cars, so that filtering them doesn't get slower
+with the history, which is kept in the archive and listed by car:archive.
+"""
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedCar, Car
+
+# Fields of the car copied to the archive.
+ARCHIVED_CAR_FIELDS = [
+    "id",
+    "registration_number",
+    "max_passengers",
+    "year_of_manufacture",
+    "manufacturer",
+    "model",
+    "category",
+    "motor_type",
+    "registration_key",
+]
+
+
+def archive_cars(cars):
+    """Move the cars of the queryset to the archive, in a single transaction.
+
+    The cars are deleted from the Car table with their signals sent, so for the
+    snapshot and the subscribers of car:events they are deleted. Returns number of
+    the archived cars.
+    """
+
+    with transaction.atomic():
+        ids = list(cars.select_for_update().values_list("id", flat=True))
+        if not ids:
+            return 0
+
+        _copy_to_archive(ids)
+        Car.objects.filter(id__in=ids).delete()
+
+    return len(ids)
+
+
+def _copy_to_archive(ids):
+    """Copy the cars to the archive by the database, in a single query."""
+
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(
+        quote_name(Car._meta.get_field(name).column) for name in ARCHIVED_CAR_FIELDS
+    )
+    archived_at = ArchivedCar._meta.get_field("archived_at").get_db_prep_value(
+        timezone.now(), connection
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(ArchivedCar._meta.db_table)} "
+            f"({columns}, {quote_name('archived_at')}) "
+            f"SELECT {columns}, %s FROM {quote_name(Car._meta.db_table)} "
+            f"WHERE {quote_name('id')} IN ({', '.join(['%s'] * len(ids))})",
+            [archived_at, *ids],
+        )
@@ -0,0 +1,74 @@
+"""Operations of car:batch, handled by the views of the single operations.
+
+Every operation gets its own request, built from the batch one without going
+through the middleware again, so it's validated, throttled and answered exactly as
+if it was sent separately.
+"""
+
+import io
+import json
+from urllib.parse import urlencode
+
+from django.http import HttpRequest, QueryDict
+
+# Headers of the batch request which don't apply to its operations.
+_BATCH_ONLY_HEADERS = {
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_IDEMPOTENCY_KEY",
+    "HTTP_IF_MATCH",
+    "QUERY_STRING",
+}
+
+
+def run_operation(request, view, method, params, data):
+    """Handle operation of the batch `request` with the view.
+
+    Returns result of the operation, with status, ETag header and data of its
+    response.
+    """
+
+    response = view(_get_operation_request(request, method, params, data))
+    if hasattr(response, "render"):
+        response.render()
+
+    result = {"status": response.status_code}
+    if response.has_header("ETag"):
+        result["etag"] = response["ETag"]
+    if response.content and response["Content-Type"].startswith("application/json"):
+        result["data"] = json.loads(response.content)
+    return result
+
+
+def _get_operation_request(request, method, params, data):
+    batch_request = getattr(request, "_request", request)
+
+    query_string = urlencode(params, doseq=True)
+    body = json.dumps(data).encode() if method == "POST" else b""
+
+    operation_request = HttpRequest()
+    operation_request.method = method
+    operation_request.path = batch_request.path
+    operation_request.path_info = batch_request.path_info
+    operation_request.META = {
+        **{
+            name: value
+            for name, value in batch_request.META.items()
+            if name not in _BATCH_ONLY_HEADERS
+        },
+        "REQUEST_METHOD": method,
+        "QUERY_STRING": query_string,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    operation_request.GET = QueryDict(query_string)
+    operation_request.COOKIES = batch_request.COOKIES
+    operation_request._stream = io.BytesIO(body)
+    operation_request._read_started = False
+
+    # Set by the middleware, which is not run for the operations.
+    for name in ["user", "session"]:
+        if hasattr(batch_request, name):
+            setattr(operation_request, name, getattr(batch_request, name))
+
+    return operation_request
@@ -0,0 +1,74 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from .models import Car
+
+log = logging.getLogger(__file__)
+
+
+def get_catalog_manufacturers():
+    """Get manufacturers of the existing cars and the ones configured in settings."""
+
+    manufacturers = set(
+        Car.objects.order_by().values_list("manufacturer", flat=True).distinct()
+    )
+    manufacturers.update(settings.CARS_CATALOG_MANUFACTURERS)
+
+    return sorted(manufacturers)
+
+
+def warm_catalog(info_api, manufacturers, max_workers, progress=None):
+    """Preload models of the given manufacturers into the `info_api` cache.
+
+    Lookups run in a pool of at most `max_workers` threads. `progress` is called after
+    each lookup with the number of finished lookups, their total, the manufacturer and
+    its models (None if the lookup failed).
+
+    Returns list of manufacturers for which the lookup failed.
+    """
+
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                info_api.get_manufacturer_models, manufacturer
+            ): manufacturer
+            for manufacturer in manufacturers
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            manufacturer = futures[future]
+            manufacturer_models = future.result()
+            if manufacturer_models is None:
+                failed.append(manufacturer)
+            if progress is not None:
+                progress(done, len(futures), manufacturer, manufacturer_models)
+
+    return failed
+
+
+def warm_catalog_in_background(info_api):
+    """Warm the catalog in a daemon thread, so that the startup is not delayed."""
+
+    def target():
+        try:
+            manufacturers = get_catalog_manufacturers()
+            failed = warm_catalog(
+                info_api, manufacturers, settings.CARS_WARM_CATALOG_WORKERS
+            )
+        except Exception:
+            log.exception("Warming up the catalog failed.")
+        else:
+            log.info(
+                "Catalog warmed up for %d manufacturers, %d failed.",
+                len(manufacturers) - len(failed),
+                len(failed),
+            )
+
+    thread = threading.Thread(target=target, name="warm-catalog", daemon=True)
+    thread.start()
+
+    return thread
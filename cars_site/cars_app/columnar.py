@@ -0,0 +1,167 @@
+"""Column oriented binary format of cars.
+
+Layout of a stream (all integers are little endian):
+
+    magic                 b"CARSCOL1"
+    schema length         uint32
+    schema                UTF-8 JSON: {"columns": [{"name": ..., "type": ...}, ...]}
+    padding               zero bytes up to a multiple of 8
+    batch*
+    end of stream         uint32 0, padded to 8 bytes
+
+A batch starts with uint32 number of rows, padded to 8 bytes, followed by buffers of
+each column in the schema order. Every buffer is prefixed with its uint32 byte length,
+padded to 8 bytes, and the buffer itself is padded to a multiple of 8 bytes, so it can
+be read in place:
+
+    int64, uint32, uint16  packed array of the values
+    utf8                   uint32 offsets array (rows + 1), then the UTF-8 data buffer
+    dictionary             utf8 column of the batch dictionary, then uint8 array of
+                           indexes into it
+"""
+
+import json
+import struct
+import sys
+from array import array
+
+MAGIC = b"CARSCOL1"
+CONTENT_TYPE = "application/vnd.cars.columnar"
+
+_ARRAY_TYPECODES = {"int64": "q", "uint32": "I", "uint16": "H", "uint8": "B"}
+_UINT32 = struct.Struct("<I")
+
+
+def get_schema(columns):
+    """Get schema for list of (name, type) pairs."""
+
+    return {"columns": [{"name": name, "type": type_} for name, type_ in columns]}
+
+
+class ColumnarWriter:
+    """Encoder of rows into the columnar format.
+
+    Every method returns the encoded bytes, so the output can be streamed.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._types = [column["type"] for column in schema["columns"]]
+
+    def header(self):
+        schema = json.dumps(self.schema).encode()
+        return _pad(MAGIC + _UINT32.pack(len(schema)) + schema)
+
+    def batch(self, rows):
+        """Encode list of rows, each being a sequence of values in the schema order."""
+
+        if not rows:
+            # Batch without rows would mark the end of the stream.
+            return b""
+
+        parts = [_pad(_UINT32.pack(len(rows)))]
+
+        for type_, values in zip(self._types, zip(*rows)):
+            if type_ == "utf8":
+                parts.extend(_encode_utf8(values))
+            elif type_ == "dictionary":
+                dictionary = {}
+                indexes = array(
+                    "B", [dictionary.setdefault(v, len(dictionary)) for v in values]
+                )
+                parts.extend(_encode_utf8(dictionary))
+                parts.append(_encode_buffer(indexes))
+            else:
+                parts.append(_encode_buffer(array(_ARRAY_TYPECODES[type_], values)))
+
+        return b"".join(parts)
+
+    @staticmethod
+    def footer():
+        return _pad(_UINT32.pack(0))
+
+
+def read_columnar(data):
+    """Decode bytes in the columnar format.
+
+    Returns the schema and a dict of column name to list of all values.
+    """
+
+    view = memoryview(data)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a columnar cars stream.")
+    position = len(MAGIC)
+
+    [schema_length] = _UINT32.unpack_from(view, position)
+    position += _UINT32.size
+    schema = json.loads(bytes(view[position : position + schema_length]))
+    position = _padded_length(position + schema_length)
+
+    columns = {column["name"]: [] for column in schema["columns"]}
+
+    while True:
+        [rows] = _UINT32.unpack_from(view, position)
+        position += 8
+        if rows == 0:
+            return schema, columns
+
+        for column in schema["columns"]:
+            if column["type"] == "utf8":
+                values, position = _decode_utf8(view, position)
+            elif column["type"] == "dictionary":
+                dictionary, position = _decode_utf8(view, position)
+                indexes, position = _decode_buffer(view, position, "B")
+                values = [dictionary[index] for index in indexes]
+            else:
+                values, position = _decode_buffer(
+                    view, position, _ARRAY_TYPECODES[column["type"]]
+                )
+            columns[column["name"]].extend(values)
+
+
+def _padded_length(length):
+    return (length + 7) // 8 * 8
+
+
+def _pad(data):
+    return data + bytes(_padded_length(len(data)) - len(data))
+
+
+def _encode_buffer(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    data = values.tobytes()
+    return _pad(_UINT32.pack(len(data)) + bytes(4) + data)
+
+
+def _encode_utf8(values):
+    offsets = array("I", [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode()
+        offsets.append(len(data))
+
+    return [_encode_buffer(offsets), _pad(_UINT32.pack(len(data)) + bytes(4) + data)]
+
+
+def _decode_buffer(view, position, typecode):
+    [length] = _UINT32.unpack_from(view, position)
+    start = position + 8
+    values = array(typecode)
+    values.frombytes(view[start : start + length])
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    return values, _padded_length(start + length)
+
+
+def _decode_utf8(view, position):
+    offsets, position = _decode_buffer(view, position, "I")
+    [length] = _UINT32.unpack_from(view, position)
+    start = position + 8
+    data = bytes(view[start : start + length])
+    values = [
+        data[offsets[i] : offsets[i + 1]].decode() for i in range(len(offsets) - 1)
+    ]
+
+    return values, _padded_length(start + length)
@@ -0,0 +1,37 @@
+"""Counting of cars, exactly or from the planner statistics on PostgreSQL."""
+
+import json
+
+from django.conf import settings
+from django.db import connections
+
+
+def count_cars(queryset, approximate=False):
+    """Get number of cars in the queryset and whether it's approximate.
+
+    With `approximate`, on PostgreSQL the number of rows estimated by the query planner
+    is returned instead, if it's at least CARS_APPROXIMATE_COUNT_MIN. Smaller counts,
+    and counts on other databases, are exact.
+    """
+
+    if approximate:
+        estimate = _get_estimated_count(queryset)
+        if estimate is not None and estimate >= settings.CARS_APPROXIMATE_COUNT_MIN:
+            return estimate, True
+
+    return queryset.count(), False
+
+
+def _get_estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        [plan] = cursor.fetchone()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,159 @@
+"""Recording of car changes as events, for subscribers of car:events.
+
+With CARS_EVENTS setting on, every save, deletion and update of cars (also through
+car:update, which doesn't call `Car.save`) is written to the CarEvent table, in the
+transaction of the change. Events are read back in order of their ids by the
+subscribers, in all processes.
+"""
+
+import contextlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .filters import CarFilter, get_filter_predicates
+from .models import Car, CarEvent, CarEventTypes
+from .signals import cars_updated
+
+# Fields of the car stored in its events.
+EVENT_CAR_FIELDS = [
+    "registration_number",
+    "max_passengers",
+    "year_of_manufacture",
+    "manufacturer",
+    "model",
+    "category",
+    "motor_type",
+]
+
+
+def atomic_with_events():
+    """Get context manager of the transaction of a change and its events.
+
+    If the events are not recorded, no transaction is started, so that the change
+    is a single query.
+    """
+
+    if settings.CARS_EVENTS:
+        return transaction.atomic()
+    return contextlib.nullcontext()
+
+
+@receiver(post_save, sender=Car)
+def _record_saved_car(sender, instance, created, **kwargs):
+    if settings.CARS_EVENTS:
+        _record_event(
+            CarEventTypes.CREATED if created else CarEventTypes.UPDATED, instance
+        )
+
+
+@receiver(post_delete, sender=Car)
+def _record_deleted_car(sender, instance, **kwargs):
+    if settings.CARS_EVENTS:
+        _record_event(CarEventTypes.DELETED, instance)
+
+
+@receiver(cars_updated, sender=Car)
+def _record_updated_cars(sender, ids, **kwargs):
+    if settings.CARS_EVENTS and ids:
+        _record_updates(ids)
+
+
+def _record_event(event_type, car):
+    CarEvent.objects.create(
+        type=event_type,
+        created_at=timezone.now(),
+        car_id=car.pk,
+        **{name: getattr(car, name) for name in EVENT_CAR_FIELDS},
+    )
+
+
+def _record_updates(ids):
+    """Record events of the cars updated in bulk, with their fields copied from the
+    cars table by the database, in a single query."""
+
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(
+        quote_name(Car._meta.get_field(name).column) for name in EVENT_CAR_FIELDS
+    )
+    created_at = CarEvent._meta.get_field("created_at").get_db_prep_value(
+        timezone.now(), connection
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(CarEvent._meta.db_table)} "
+            f"({quote_name('type')}, {quote_name('created_at')}, "
+            f"{quote_name('car_id')}, {columns}) "
+            f"SELECT %s, %s, {quote_name('id')}, {columns} "
+            f"FROM {quote_name(Car._meta.db_table)} "
+            f"WHERE {quote_name('id')} IN ({', '.join(['%s'] * len(ids))})",
+            [CarEventTypes.UPDATED, created_at, *ids],
+        )
+
+
+def fetch_events(after_id, until_id=None, limit=1000):
+    """Get list of events with ids greater than `after_id`, in order of ids."""
+
+    close_old_connections()
+    events = CarEvent.objects.filter(id__gt=after_id).order_by("id")
+    if until_id is not None:
+        events = events.filter(id__lte=until_id)
+    return list(events[:limit])
+
+
+def get_last_event_id():
+    close_old_connections()
+    last = CarEvent.objects.order_by("-id").values_list("id", flat=True).first()
+    return last or 0
+
+
+def delete_old_events():
+    close_old_connections()
+    CarEvent.objects.filter(
+        created_at__lt=timezone.now()
+        - timedelta(seconds=settings.CARS_EVENTS_RETENTION)
+    ).delete()
+
+
+def get_event_matcher(params):
+    """Get function checking if an event matches the car:list filters in params.
+
+    Raises ValueError if the filters are invalid.
+    """
+
+    car_filter = CarFilter(params)
+    if not car_filter.is_valid():
+        raise ValueError(car_filter.errors.as_text())
+
+    predicates = get_filter_predicates()
+    conditions = [
+        (predicates[name], value)
+        for name, value in car_filter.form.cleaned_data.items()
+        if value not in (None, "")
+    ]
+
+    def matches(event):
+        return all(
+            operator_(getattr(event, field_name), value)
+            for (field_name, operator_), value in conditions
+        )
+
+    return matches
+
+
+def format_event(event):
+    """Format the event as a message of server-sent events stream."""
+
+    data = json.dumps(
+        {
+            "pk": event.car_id,
+            "fields": {name: getattr(event, name) for name in EVENT_CAR_FIELDS},
+        }
+    )
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n".encode()
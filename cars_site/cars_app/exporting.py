@@ -0,0 +1,178 @@
+"""Streaming export of cars to CSV, NDJSON and the columnar format."""
+
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import QueryDict
+
+from .columnar import ColumnarWriter, get_schema
+from .filters import CarFilter
+from .models import Car
+
+EXPORT_FIELDS = [field.name for field in Car._meta.concrete_fields if field.editable]
+
+
+def iter_chunks(queryset, fields, chunk_size, min_id=None, max_id=None):
+    """Yield lists of rows (tuples of `fields` values) of the queryset in id order.
+
+    Rows are read with keyset pagination, so each chunk is fetched with an index range
+    scan no matter how deep into the table it is. `min_id` and `max_id` limit the
+    exported ids to an inclusive range.
+    """
+
+    queryset = queryset.order_by("id")
+    if min_id is not None:
+        queryset = queryset.filter(id__gte=min_id)
+    if max_id is not None:
+        queryset = queryset.filter(id__lte=max_id)
+
+    # The id is needed to know where the next chunk starts.
+    id_index = fields.index("id") if "id" in fields else None
+    values_fields = fields if id_index is not None else [*fields, "id"]
+
+    last_id = None
+    while True:
+        chunk_queryset = queryset
+        if last_id is not None:
+            chunk_queryset = queryset.filter(id__gt=last_id)
+        rows = list(chunk_queryset.values_list(*values_fields)[:chunk_size])
+        if not rows:
+            return
+
+        if id_index is None:
+            last_id = rows[-1][-1]
+            rows = [row[:-1] for row in rows]
+        else:
+            last_id = rows[-1][id_index]
+        yield rows
+
+
+class CsvWriter:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def header(self):
+        return self._encode([self.fields])
+
+    def batch(self, rows):
+        return self._encode(rows)
+
+    @staticmethod
+    def footer():
+        return b""
+
+    @staticmethod
+    def _encode(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+
+class NdjsonWriter:
+    def __init__(self, fields):
+        self.fields = fields
+
+    @staticmethod
+    def header():
+        return b""
+
+    def batch(self, rows):
+        return "".join(
+            json.dumps(dict(zip(self.fields, row))) + "\n" for row in rows
+        ).encode()
+
+    @staticmethod
+    def footer():
+        return b""
+
+
+class _ModelColumnarWriter(ColumnarWriter):
+    """Columnar writer of model fields, with date times written as strings in the
+    format of the JSON responses."""
+
+    def __init__(self, schema, datetime_indexes):
+        super().__init__(schema)
+        self._datetime_indexes = datetime_indexes
+        self._json_encoder = DjangoJSONEncoder()
+
+    def batch(self, rows):
+        if self._datetime_indexes:
+            rows = [self._convert_datetimes(row) for row in rows]
+        return super().batch(rows)
+
+    def _convert_datetimes(self, row):
+        row = list(row)
+        for index in self._datetime_indexes:
+            row[index] = self._json_encoder.default(row[index])
+        return row
+
+
+def get_columnar_writer(fields, model=Car):
+    model_fields = [model._meta.get_field(name) for name in fields]
+    return _ModelColumnarWriter(
+        get_schema([(field.name, _get_column_type(field)) for field in model_fields]),
+        datetime_indexes=[
+            index
+            for index, field in enumerate(model_fields)
+            if isinstance(field, models.DateTimeField)
+        ],
+    )
+
+
+def _get_column_type(field):
+    if field.choices:
+        return "dictionary"
+    elif isinstance(field, models.PositiveIntegerField):
+        return "uint32"
+    elif isinstance(field, models.IntegerField):
+        # Also ids, of cars and of the archived ones.
+        return "int64"
+    else:
+        return "utf8"
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "ndjson": NdjsonWriter,
+    "columnar": get_columnar_writer,
+}
+
+
+def get_writer(file_format, fields):
+    return WRITERS[file_format](fields)
+
+
+def get_filtered_cars(filter_params):
+    """Get queryset of the cars matching car:list filters given as a query string.
+
+    Raises ValueError if the filters are invalid.
+    """
+
+    car_filter = CarFilter(QueryDict(filter_params))
+    if not car_filter.is_valid():
+        raise ValueError(car_filter.errors.as_text())
+    return car_filter.qs
+
+
+def export_range(path, file_format, filter_params, chunk_size, min_id, max_id):
+    """Write batches of the filtered cars with ids in the range to the file, without
+    a header.
+
+    Filters are given as a query string, not a queryset, as the function is run by
+    worker processes and pickling a queryset would fetch all its cars. Returns number
+    of written rows.
+    """
+
+    queryset = get_filtered_cars(filter_params)
+    writer = get_writer(file_format, EXPORT_FIELDS)
+    rows_count = 0
+
+    with open(path, "wb") as file:
+        for rows in iter_chunks(queryset, EXPORT_FIELDS, chunk_size, min_id, max_id):
+            file.write(writer.batch(rows))
+            rows_count += len(rows)
+
+    return rows_count
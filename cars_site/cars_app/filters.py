@@ -1,14 +1,87 @@
+import operator
+
 from django_filters import rest_framework as filters
 
-from .models import Car
+from .models import ArchivedCar, Car, normalize_registration_number
 
 
 class CarFilter(filters.FilterSet):
+    # Registration number however it's spelled, e.g. "ab 123" finds "AB-123".
+    plate = filters.CharFilter(method="filter_plate")
+    plate__startswith = filters.CharFilter(method="filter_plate")
+
+    # Lists of values and ranges are given comma separated, e.g.
+    # manufacturer__in=Ford,Kia or max_passengers__range=4,7.
     class Meta:
         model = Car
         fields = {
-            "max_passengers": ["exact", "gt"],
-            "year_of_manufacture": ["lt", "exact", "gt"],
-            "manufacturer": ["exact"],
+            "max_passengers": ["exact", "gt", "gte", "lt", "lte", "in", "range"],
+            "year_of_manufacture": ["exact", "gt", "gte", "lt", "lte", "in", "range"],
+            "manufacturer": ["exact", "in"],
+            "category": ["exact", "in"],
+            "motor_type": ["exact", "in"],
             "registration_number": ["icontains"],
         }
+
+    def filter_plate(self, queryset, name, value):
+        lookup = name.replace("plate", "registration_key", 1)
+        return queryset.filter(**{lookup: normalize_registration_number(value)})
+
+
+class ArchivedCarFilter(CarFilter):
+    """Filters of car:list, and the time of archiving, for the archived cars."""
+
+    class Meta(CarFilter.Meta):
+        model = ArchivedCar
+        fields = {**CarFilter.Meta.fields, "archived_at": ["gte", "lt"]}
+
+
+def _is_in(value, values):
+    return value in values
+
+
+def _is_in_range(value, bounds):
+    return bounds[0] <= value <= bounds[1]
+
+
+def _contains_ignoring_case(value, substring):
+    return substring.lower() in value.lower()
+
+
+_LOOKUP_OPERATORS = {
+    "exact": operator.eq,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "in": _is_in,
+    "range": _is_in_range,
+    "icontains": _contains_ignoring_case,
+}
+
+
+def _is_same_plate(registration_number, plate):
+    return normalize_registration_number(
+        registration_number
+    ) == normalize_registration_number(plate)
+
+
+def _is_plate_prefix(registration_number, plate):
+    return normalize_registration_number(registration_number).startswith(
+        normalize_registration_number(plate)
+    )
+
+
+def get_filter_predicates():
+    """Get filters of CarFilter with fields and operators comparing their values
+    with the filter values, for filtering cars outside of the database."""
+
+    predicates = {
+        "plate": ("registration_number", _is_same_plate),
+        "plate__startswith": ("registration_number", _is_plate_prefix),
+    }
+    for field_name, lookups in CarFilter.Meta.fields.items():
+        for lookup in lookups:
+            name = field_name if lookup == "exact" else f"{field_name}__{lookup}"
+            predicates[name] = (field_name, _LOOKUP_OPERATORS[lookup])
+    return predicates
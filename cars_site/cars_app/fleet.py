@@ -0,0 +1,112 @@
+"""Generation of realistic fleets of cars, for performance tests and benchmarks.
+
+Attributes follow fixed distributions and models come from a stub catalog instead of
+the external vehicles API, so generated fleets are repeatable for a seed.
+"""
+
+import itertools
+import random
+import string
+from datetime import datetime
+
+from django.db.models import Max
+
+from .models import Car, CarCategoryChoices, MotorTypeChoices
+
+# Models of the manufacturers, in place of the external vehicles API.
+STUB_CATALOG = {
+    "Toyota": ["Corolla", "Camry", "Prius", "RAV4", "Yaris", "Auris"],
+    "Volkswagen": ["Golf", "Passat", "Polo", "Tiguan", "Touran", "Sharan"],
+    "Skoda": ["Octavia", "Superb", "Fabia", "Kodiaq", "Karoq"],
+    "Ford": ["Focus", "Mondeo", "Fiesta", "Galaxy", "S-Max", "Kuga"],
+    "Mercedes-Benz": ["E-Class", "S-Class", "C-Class", "V-Class", "Vito"],
+    "BMW": ["3 Series", "5 Series", "7 Series", "X5"],
+    "Audi": ["A4", "A6", "A8", "Q7"],
+    "Kia": ["Ceed", "Sportage", "Niro", "Sorento"],
+    "Hyundai": ["i30", "Tucson", "Ioniq", "Kona"],
+    "Tesla": ["Model 3", "Model S", "Model X", "Model Y"],
+}
+MANUFACTURER_WEIGHTS = [20, 18, 14, 12, 9, 7, 6, 6, 5, 3]
+CATEGORY_WEIGHTS = {
+    CarCategoryChoices.ECONOMY: 60,
+    CarCategoryChoices.BUSINESS: 30,
+    CarCategoryChoices.FIRST_CLASS: 10,
+}
+MOTOR_TYPE_WEIGHTS = {MotorTypeChoices.HYBRID: 70, MotorTypeChoices.ELECTRIC: 30}
+MAX_PASSENGERS_WEIGHTS = {2: 3, 4: 22, 5: 48, 7: 17, 8: 7, 9: 3}
+OLDEST_YEAR = 1995
+
+# Registration numbers have the form "AB-1234-CD". Numbers of the generated cars are
+# mapped to them with multiplication by a number coprime with their count, so they
+# are unique, but not sequential.
+_PLATE_LETTERS = string.ascii_uppercase
+_PLATES_COUNT = len(_PLATE_LETTERS) ** 4 * 10_000
+_PLATE_MULTIPLIER = 2_654_435_761
+
+
+def get_stub_models(manufacturer):
+    """Get models of the manufacturer from the stub catalog, like
+    `CarsInfoCheckApi.get_manufacturer_models`."""
+
+    return STUB_CATALOG.get(manufacturer)
+
+
+def get_registration_number(number):
+    """Get unique registration number of the generated car with the number."""
+
+    code = number * _PLATE_MULTIPLIER % _PLATES_COUNT
+    code, digits = divmod(code, 10_000)
+    letters = []
+    for _ in range(4):
+        code, letter = divmod(code, len(_PLATE_LETTERS))
+        letters.append(_PLATE_LETTERS[letter])
+    return f"{letters[0]}{letters[1]}-{digits:04}-{letters[2]}{letters[3]}"
+
+
+def generate_cars(number, start=0, seed=0):
+    """Generate unsaved cars with numbers from `start`, for registration numbers."""
+
+    generator = random.Random(seed)
+    manufacturers = list(STUB_CATALOG)
+    current_year = datetime.now().year
+
+    for car_number in range(start, start + number):
+        manufacturer = generator.choices(manufacturers, MANUFACTURER_WEIGHTS)[0]
+        yield Car(
+            registration_number=get_registration_number(car_number),
+            max_passengers=generator.choices(
+                list(MAX_PASSENGERS_WEIGHTS), list(MAX_PASSENGERS_WEIGHTS.values())
+            )[0],
+            # Newer cars are more common.
+            year_of_manufacture=round(
+                generator.triangular(OLDEST_YEAR, current_year, current_year - 3)
+            ),
+            manufacturer=manufacturer,
+            model=generator.choice(STUB_CATALOG[manufacturer]),
+            category=generator.choices(
+                list(CATEGORY_WEIGHTS), list(CATEGORY_WEIGHTS.values())
+            )[0],
+            motor_type=generator.choices(
+                list(MOTOR_TYPE_WEIGHTS), list(MOTOR_TYPE_WEIGHTS.values())
+            )[0],
+        )
+
+
+def create_fleet(number, batch_size=5000, seed=0):
+    """Create the number of generated cars with `bulk_create`, in batches.
+
+    Registration numbers continue after the cars created so far, as every created car
+    takes an id, so fleets can be added to an existing one. Returns number of the
+    created cars.
+    """
+
+    start = (Car.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+    cars = generate_cars(number, start=start, seed=seed)
+
+    created = 0
+    while True:
+        batch = list(itertools.islice(cars, batch_size))
+        if not batch:
+            return created
+        Car.objects.bulk_create(batch)
+        created += len(batch)
@@ -0,0 +1,110 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .throttling import get_client_ident
+
+CACHE_KEY_PREFIX = "cars_app:idempotency:"
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(view):
+    """Replay the stored response when a request is retried with the same
+    Idempotency-Key header, instead of handling it again.
+
+    Responses are kept in the cache for CARS_IDEMPOTENCY_KEY_TTL seconds, per view,
+    client (its user or address, like for throttling) and key. A retry with a
+    different body is rejected with 422 status and a retry of a request still being
+    handled with 409 status, for up to CARS_IDEMPOTENCY_IN_PROGRESS_TTL seconds.
+    Server errors are not stored, so such requests can be retried.
+    """
+
+    @functools.wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"Idempotency-Key should have 1-{MAX_KEY_LENGTH} chars."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Keys are chosen by clients, so the same key of another client is a
+        # different one.
+        client = get_client_ident(request)
+        cache_key = f"{CACHE_KEY_PREFIX}{view.__name__}:{client}:{key}"
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        # Marks the key as taken by this request until its response is stored, or
+        # for the time of a request if its worker is killed before that.
+        if not cache.add(
+            cache_key, (fingerprint, None), settings.CARS_IDEMPOTENCY_IN_PROGRESS_TTL
+        ):
+            return _replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(
+                cache_key,
+                (fingerprint, _dump_response(response)),
+                settings.CARS_IDEMPOTENCY_KEY_TTL,
+            )
+        return response
+
+    return wrapped_view
+
+
+def _replay(stored, fingerprint):
+    if stored is None or stored[1] is None:
+        # The first request is still handled, or the key has just expired.
+        return Response(
+            {"detail": "Request with this Idempotency-Key is being processed."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    stored_fingerprint, dumped_response = stored
+    if stored_fingerprint != fingerprint:
+        return Response(
+            {"detail": "Idempotency-Key was used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    response = _load_response(dumped_response)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _dump_response(response):
+    dumped = {"status": response.status_code, "headers": dict(response.items())}
+    if isinstance(response, Response):
+        # Rendered when the response is replayed, with the negotiated renderer.
+        dumped["data"] = json.loads(json.dumps(response.data, cls=JSONEncoder))
+    else:
+        dumped["content"] = response.content
+    return dumped
+
+
+def _load_response(dumped):
+    if "data" in dumped:
+        response = Response(dumped["data"], status=dumped["status"])
+    else:
+        response = HttpResponse(dumped["content"], status=dumped["status"])
+
+    for header, value in dumped["headers"].items():
+        response[header] = value
+    return response
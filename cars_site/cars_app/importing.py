@@ -0,0 +1,140 @@
+"""Streaming import of cars from CSV and NDJSON files."""
+
+import csv
+import json
+import os
+
+import django
+from django.apps import apps
+from django.core.exceptions import ValidationError
+
+from .models import Car
+
+IMPORT_FIELDS = [
+    field.name
+    for field in Car._meta.concrete_fields
+    if field.editable and not field.primary_key
+]
+
+
+class WrongRecordException(Exception):
+    pass
+
+
+class _LineReader:
+    """Iterator over lines of a binary file, keeping the offset of consumed bytes."""
+
+    def __init__(self, file):
+        self.file = file
+        self.offset = file.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8")
+
+
+def read_csv_records(file, offset=0):
+    """Yield (record, offset after the record) pairs from CSV file with a header.
+
+    Reading starts at the given byte offset, which must be a record boundary returned
+    earlier by this function. Records are dicts, or WrongRecordException instances for
+    records which can't be read.
+    """
+
+    header = next(csv.reader(_LineReader(file)), None)
+    if header is None:
+        return
+    if offset:
+        file.seek(offset)
+
+    lines = _LineReader(file)
+    for values in csv.reader(lines):
+        if not values:
+            continue
+        if len(values) != len(header):
+            record = WrongRecordException(
+                f"Expected {len(header)} values, got {len(values)}."
+            )
+        else:
+            record = dict(zip(header, values))
+        yield record, lines.offset
+
+
+def read_ndjson_records(file, offset=0):
+    """Yield (record, offset after the record) pairs from NDJSON file.
+
+    See `read_csv_records`.
+    """
+
+    file.seek(offset)
+
+    lines = _LineReader(file)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = WrongRecordException(f"Invalid JSON: {e}")
+        else:
+            if not isinstance(record, dict):
+                record = WrongRecordException("Record should be a JSON object.")
+        yield record, lines.offset
+
+
+def init_worker():
+    """Set up Django in a worker process which was not forked from a set up one."""
+
+    if not apps.ready:
+        django.setup()
+
+
+def validate_records(records):
+    """Validate records against the Car model field rules.
+
+    Uniqueness and the manufacturer models are not checked here, as they need
+    information shared by all records.
+
+    Returns list of (car, errors) pairs, where either car is an unsaved Car instance
+    or errors is a dict of error messages.
+    """
+
+    results = []
+
+    for record in records:
+        if isinstance(record, WrongRecordException):
+            results.append((None, {"__all__": [str(record)]}))
+            continue
+
+        car = Car(**{name: record.get(name) for name in IMPORT_FIELDS})
+        try:
+            car.clean_fields()
+        except ValidationError as e:
+            results.append((None, e.message_dict))
+        else:
+            results.append((car, None))
+
+    return results
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, checkpoint):
+    """Save checkpoint atomically, so a crash can't leave it partially written."""
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
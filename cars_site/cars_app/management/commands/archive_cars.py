@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from cars_app.archiving import archive_cars
+from cars_app.filters import CarFilter
+
+
+class Command(BaseCommand):
+    help = (
+        "Move cars matching car:list filter parameters to the archive. Cars are moved "
+        "in batches, each in a short transaction, so the Car table is not locked for "
+        "long and the command can be run while the app serves requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="PARAM=VALUE",
+            help="car:list filter parameter, e.g. year_of_manufacture__lt=2005. "
+            "Repeatable, at least one is required.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, to leave room for other writes.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["filter"]:
+            raise CommandError("Give at least one --filter of the archived cars.")
+        if options["batch_size"] < 1:
+            raise CommandError("Batch size must be positive.")
+
+        queryset = self._get_queryset(options["filter"])
+        archived_count = 0
+        last_id = 0
+
+        while True:
+            # Batches are read in order of ids, so the following ones start at the
+            # end of the index range of the previous one.
+            ids = list(
+                queryset.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+
+            # Cars changed since they were read are archived only if they still match.
+            archived_count += archive_cars(queryset.filter(id__in=ids))
+            last_id = ids[-1]
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived_count} cars."))
+
+    @staticmethod
+    def _get_queryset(filters):
+        params = QueryDict(mutable=True)
+        for param in filters:
+            name, separator, value = param.partition("=")
+            if not separator:
+                raise CommandError(f"Filter should be PARAM=VALUE, got: {param!r}.")
+            params.appendlist(name, value)
+
+        car_filter = CarFilter(params)
+        if not car_filter.is_valid():
+            raise CommandError(f"Invalid filters: {car_filter.errors.as_text()}")
+
+        return car_filter.qs
@@ -0,0 +1,139 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.http import QueryDict
+
+from cars_app.exporting import (
+    EXPORT_FIELDS,
+    WRITERS,
+    export_range,
+    get_filtered_cars,
+    get_writer,
+)
+from cars_app.importing import init_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Export cars, optionally filtered with car:list filter parameters, to a CSV, "
+        "NDJSON or columnar file. Cars are read in chunks, so the memory usage "
+        "doesn't depend on the number of exported cars."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(WRITERS),
+            help="Format of the file. Guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="PARAM=VALUE",
+            help="car:list filter parameter, e.g. max_passengers__gt=4. Repeatable.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes reading the cars, each a separate id range.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".")
+        if file_format not in WRITERS:
+            raise CommandError(
+                f"Unknown file format: {file_format!r}. Use --format option."
+            )
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("Chunk size and number of workers must be positive.")
+
+        filter_params = self._get_filter_params(options["filter"])
+        try:
+            queryset = get_filtered_cars(filter_params)
+        except ValueError as e:
+            raise CommandError(f"Invalid filters: {e}")
+        ranges = self._split_id_range(queryset, options["workers"])
+        part_paths = [f"{path}.part{i}" for i in range(len(ranges))]
+
+        try:
+            if len(ranges) > 1:
+                # Worker processes must not share the connection of this one.
+                connections.close_all()
+                with ProcessPoolExecutor(len(ranges), initializer=init_worker) as pool:
+                    futures = [
+                        pool.submit(
+                            export_range,
+                            part_path,
+                            file_format,
+                            filter_params,
+                            options["chunk_size"],
+                            min_id,
+                            max_id,
+                        )
+                        for part_path, (min_id, max_id) in zip(part_paths, ranges)
+                    ]
+                    rows_count = sum(future.result() for future in futures)
+            else:
+                rows_count = sum(
+                    export_range(
+                        part_path,
+                        file_format,
+                        filter_params,
+                        options["chunk_size"],
+                        min_id,
+                        max_id,
+                    )
+                    for part_path, (min_id, max_id) in zip(part_paths, ranges)
+                )
+
+            writer = get_writer(file_format, EXPORT_FIELDS)
+            with open(path, "wb") as file:
+                file.write(writer.header())
+                for part_path in part_paths:
+                    with open(part_path, "rb") as part_file:
+                        shutil.copyfileobj(part_file, file)
+                file.write(writer.footer())
+        finally:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {rows_count} cars."))
+
+    @staticmethod
+    def _get_filter_params(filters):
+        """Get the filter parameters as a query string."""
+
+        params = QueryDict(mutable=True)
+        for param in filters:
+            name, separator, value = param.partition("=")
+            if not separator:
+                raise CommandError(f"Filter should be PARAM=VALUE, got: {param!r}.")
+            params.appendlist(name, value)
+
+        return params.urlencode()
+
+    @staticmethod
+    def _split_id_range(queryset, parts):
+        """Split ids of the queryset into inclusive (min, max) ranges for workers."""
+
+        ids = queryset.aggregate(min_id=Min("id"), max_id=Max("id"))
+        if ids["min_id"] is None:
+            return [(None, None)]
+
+        span = ids["max_id"] - ids["min_id"] + 1
+        step = -(-span // parts)
+
+        return [
+            (min_id, min(min_id + step - 1, ids["max_id"]))
+            for min_id in range(ids["min_id"], ids["max_id"] + 1, step)
+        ]
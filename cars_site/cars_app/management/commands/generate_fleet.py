@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cars_app.fleet import create_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a fleet of generated cars, with unique registration numbers, "
+        "realistic distributions of their attributes and models of a stub catalog. "
+        "Meant for test and benchmark databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("cars", type=int, help="Number of cars, e.g. 1000000.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the attributes, the same fleet is generated for a seed.",
+        )
+
+    def handle(self, *args, **options):
+        if options["cars"] < 1 or options["batch_size"] < 1:
+            raise CommandError("Number of cars and batch size must be positive.")
+
+        started = time.monotonic()
+        created = create_fleet(
+            options["cars"], batch_size=options["batch_size"], seed=options["seed"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} cars in {time.monotonic() - started:.1f} s."
+            )
+        )
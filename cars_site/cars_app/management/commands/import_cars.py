@@ -0,0 +1,278 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from cars_app.catalog import warm_catalog
+from cars_app.importing import (
+    IMPORT_FIELDS,
+    init_worker,
+    load_checkpoint,
+    read_csv_records,
+    read_ndjson_records,
+    save_checkpoint,
+    validate_records,
+)
+from cars_app.models import Car
+from cars_app.serializers import get_manufacturer_model_error
+from cars_app.views import info_api
+
+READERS = {"csv": read_csv_records, "ndjson": read_ndjson_records}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import cars from a CSV (with a header) or NDJSON file. The file is streamed, "
+        "rows are validated with the same rules as in car:add and written in chunks. "
+        "Rejected rows are written to a side file and the progress to a checkpoint "
+        "file, from which an interrupted import is resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Format of the file. Guessed from its extension by default.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes validating the rows.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file. Default: <path>.checkpoint",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="File for the rejected rows, in NDJSON. Default: <path>.rejects",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and import the file from the beginning.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".")
+        if file_format not in READERS:
+            raise CommandError(
+                f"Unknown file format: {file_format!r}. Use --format option."
+            )
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("Chunk size and number of workers must be positive.")
+
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        rejects_path = options["rejects"] or f"{path}.rejects"
+
+        checkpoint = None if options["restart"] else load_checkpoint(checkpoint_path)
+        if checkpoint is None:
+            checkpoint = {"offset": 0, "rows": 0, "imported": 0, "rejected": 0}
+            self._resumed_until = 0
+        else:
+            self.stdout.write(f"Resuming import after {checkpoint['rows']} rows.")
+            # The checkpoint is saved after the cars of a chunk, so the chunk being
+            # saved when the import was interrupted may be saved already.
+            self._resumed_until = checkpoint["rows"] + checkpoint.get(
+                "chunk_size", options["chunk_size"]
+            )
+        checkpoint["chunk_size"] = options["chunk_size"]
+
+        self._catalog = {}
+        self._started = time.monotonic()
+        self._rows_at_start = checkpoint["rows"]
+
+        with open(path, "rb") as file, open(
+            rejects_path, "a" if checkpoint["rows"] else "w"
+        ) as rejects_file:
+            chunks = self._read_chunks(
+                READERS[file_format](file, checkpoint["offset"]), options["chunk_size"]
+            )
+            for records, offset, results in self._validate(chunks, options["workers"]):
+                imported, rejected = self._import_chunk(
+                    records, results, checkpoint["rows"], rejects_file
+                )
+                rejects_file.flush()
+
+                checkpoint["offset"] = offset
+                checkpoint["rows"] += len(records)
+                checkpoint["imported"] += imported
+                checkpoint["rejected"] += rejected
+                save_checkpoint(checkpoint_path, checkpoint)
+                self._report(checkpoint)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {checkpoint['imported']} cars, rejected "
+                f"{checkpoint['rejected']} rows."
+            )
+        )
+
+    @staticmethod
+    def _read_chunks(records, chunk_size):
+        """Yield (records, offset after the last record) chunks."""
+
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            yield [record for record, _ in chunk], chunk[-1][1]
+
+    @staticmethod
+    def _validate(chunks, workers):
+        """Yield (records, offset, validation results) in the order of the chunks.
+
+        With multiple workers at most two chunks per worker are read ahead, so that
+        the memory usage doesn't depend on the size of the file.
+        """
+
+        if workers == 1:
+            for records, offset in chunks:
+                yield records, offset, validate_records(records)
+            return
+
+        with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+            pending = deque()
+            for records, offset in chunks:
+                pending.append(
+                    (records, offset, pool.submit(validate_records, records))
+                )
+                if len(pending) >= 2 * workers:
+                    records, offset, future = pending.popleft()
+                    yield records, offset, future.result()
+            while pending:
+                records, offset, future = pending.popleft()
+                yield records, offset, future.result()
+
+    def _import_chunk(self, records, results, first_row, rejects_file):
+        """Save valid cars of the chunk and write the rejected rows.
+
+        Returns numbers of imported and rejected rows.
+        """
+
+        rejected = {}
+        for row, (car, errors) in enumerate(results, start=first_row + 1):
+            if errors:
+                rejected[row] = errors
+
+        valid = {
+            row: car
+            for row, (car, _) in enumerate(results, start=first_row + 1)
+            if row not in rejected
+        }
+
+        self._check_manufacturer_models(valid, rejected)
+        already_imported = self._check_registration_numbers(
+            valid, rejected, self._resumed_until
+        )
+        self._save(valid, rejected)
+
+        for row, errors in rejected.items():
+            record = records[row - first_row - 1]
+            rejects_file.write(
+                json.dumps(
+                    {
+                        "row": row,
+                        "record": None if isinstance(record, Exception) else record,
+                        "errors": errors,
+                    }
+                )
+                + "\n"
+            )
+
+        return len(valid) + already_imported, len(rejected)
+
+    def _check_manufacturer_models(self, valid, rejected):
+        missing = {car.manufacturer for car in valid.values()} - self._catalog.keys()
+        if missing:
+            warm_catalog(info_api, missing, settings.CARS_WARM_CATALOG_WORKERS)
+            for manufacturer in missing:
+                manufacturer_models = info_api.get_manufacturer_models(manufacturer)
+                if manufacturer_models is not None:
+                    self._catalog[manufacturer] = set(manufacturer_models)
+
+        for row, car in list(valid.items()):
+            if car.manufacturer not in self._catalog:
+                error = "Manufacturer models could not be fetched."
+            else:
+                error = get_manufacturer_model_error(
+                    car.manufacturer, car.model, self._catalog[car.manufacturer]
+                )
+            if error:
+                rejected[row] = {"non_field_errors": [error]}
+                del valid[row]
+
+    @staticmethod
+    def _check_registration_numbers(valid, rejected, resumed_until):
+        """Reject rows with registration numbers of existing cars.
+
+        Rows up to `resumed_until`, of the chunk interrupted before its checkpoint,
+        which are identical to existing cars are skipped and counted as imported
+        instead. Returns number of such rows.
+        """
+
+        # Values of the existing cars by their registration numbers. Cars of the
+        # previous rows of the chunk have None, as their duplicates are rejected.
+        existing = {
+            values["registration_number"]: values
+            for values in Car.objects.filter(
+                registration_number__in=[
+                    car.registration_number for car in valid.values()
+                ]
+            ).values(*IMPORT_FIELDS)
+        }
+        already_imported = 0
+
+        for row, car in list(valid.items()):
+            if car.registration_number not in existing:
+                existing[car.registration_number] = None
+                continue
+
+            values = existing[car.registration_number]
+            if row <= resumed_until and values == {
+                name: getattr(car, name) for name in IMPORT_FIELDS
+            }:
+                already_imported += 1
+            else:
+                rejected[row] = {
+                    "registration_number": [
+                        "car with this registration number already exists."
+                    ]
+                }
+            del valid[row]
+
+        return already_imported
+
+    @staticmethod
+    def _save(valid, rejected):
+        try:
+            with transaction.atomic():
+                Car.objects.bulk_create(valid.values())
+        except IntegrityError:
+            # Some rows were added concurrently, save the chunk row by row.
+            for row, car in list(valid.items()):
+                car.pk = None
+                try:
+                    with transaction.atomic():
+                        car.save(force_insert=True)
+                except IntegrityError as e:
+                    rejected[row] = {"__all__": [str(e)]}
+                    del valid[row]
+
+    def _report(self, checkpoint):
+        elapsed = time.monotonic() - self._started
+        rate = (checkpoint["rows"] - self._rows_at_start) / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{checkpoint['rows']} rows: {checkpoint['imported']} imported, "
+            f"{checkpoint['rejected']} rejected ({rate:.0f} rows/s)"
+        )
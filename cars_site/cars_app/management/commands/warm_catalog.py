@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cars_app.catalog import get_catalog_manufacturers, warm_catalog
+from cars_app.views import info_api
+
+
+class Command(BaseCommand):
+    help = (
+        "Preload the make-model catalog from the external vehicles API for "
+        "manufacturers of the existing cars and the ones from "
+        "CARS_CATALOG_MANUFACTURERS setting. The catalog is shared with the server "
+        "processes through the cache when CARS_INFO_API_LOCK_DIR is configured."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "manufacturers",
+            nargs="*",
+            help="Manufacturers to preload instead of the default ones.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.CARS_WARM_CATALOG_WORKERS,
+            help="Maximum number of concurrent requests to the external API.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("Number of workers must be positive.")
+
+        manufacturers = options["manufacturers"] or get_catalog_manufacturers()
+
+        failed = warm_catalog(
+            info_api, manufacturers, options["workers"], progress=self._report
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Catalog warmed up for {len(manufacturers) - len(failed)} "
+                f"manufacturers."
+            )
+        )
+        if failed:
+            raise CommandError(f"Lookup failed for: {', '.join(sorted(failed))}.")
+
+    def _report(self, done, total, manufacturer, manufacturer_models):
+        if manufacturer_models is None:
+            outcome = "failed"
+        else:
+            outcome = f"{len(manufacturer_models)} models"
+        self.stdout.write(f"[{done}/{total}] {manufacturer}: {outcome}")
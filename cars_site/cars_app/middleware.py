@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .profiling import (
+    get_profile_response,
+    is_profiling_allowed,
+    stack_sampler,
+    start_request_profile,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compress responses larger than CARS_COMPRESSION_MIN_SIZE bytes.
+
+    Brotli is used if the `brotli` package is installed and the client accepts it,
+    otherwise gzip if the client accepts it.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and (
+            len(response.content) < settings.CARS_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or not re_accepts_brotli.search(accept_encoding)
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        compressed_content = brotli.compress(response.content)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response["Content-Length"] = str(len(response.content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = "br"
+
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests of authorized clients with X-Profile header, and let the
+    stack sampler sample the threads handling requests, if it's configured.
+
+    Profiling starts before the view, when the user of the request is known, and
+    covers the view and the inner middleware handling the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.CARS_PROFILING_SAMPLE_INTERVAL:
+            stack_sampler.start(settings.CARS_PROFILING_SAMPLE_INTERVAL)
+
+    def __call__(self, request):
+        with stack_sampler.track_current_thread():
+            response = self.get_response(request)
+
+            profiler = getattr(request, "_profiler", None)
+            if profiler is not None:
+                response = get_profile_response(profiler, response)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, "profiling_exempt", False):
+            return None
+
+        token = request.headers.get("X-Profile")
+        if token is not None and is_profiling_allowed(request, token):
+            request._profiler = start_request_profile()
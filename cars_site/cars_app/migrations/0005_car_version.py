@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0004_fix_fields_are_not_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
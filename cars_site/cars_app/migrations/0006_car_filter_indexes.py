@@ -0,0 +1,29 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0005_car_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='car',
+            name='manufacturer',
+            field=models.CharField(db_index=True, default=None, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='max_passengers',
+            field=models.PositiveIntegerField(db_index=True, validators=[django.core.validators.MinValueValidator(1, 'Max passengers value is to low. Min: 1'), django.core.validators.MaxValueValidator(60, 'Max passengers value is to high. Max: 60')]),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='year_of_manufacture',
+            field=models.PositiveIntegerField(db_index=True, validators=[django.core.validators.MinValueValidator(1886, message='Manufacture year is to low. Min: 1886'), django.core.validators.MaxValueValidator(2026, message='Manufacture year is to high. Max: 2026')]),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:14
+
+import re
+
+from django.db import migrations, models
+
+
+def fill_registration_keys(apps, schema_editor):
+    # Copy of cars_app.models.normalize_registration_number, as of this migration.
+    separators = re.compile(r'[ .\-]')
+
+    Car = apps.get_model('cars_app', 'Car')
+    cars = Car.objects.using(schema_editor.connection.alias).order_by('id')
+
+    # Cars are updated in batches read with keyset pagination, so that the table is not
+    # read while it's being written.
+    last_id = 0
+    while True:
+        batch = list(cars.filter(id__gt=last_id).only('id', 'registration_number')[:2000])
+        if not batch:
+            return
+        for car in batch:
+            car.registration_key = separators.sub('', car.registration_number).upper()
+        cars.bulk_update(batch, ['registration_key'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0006_car_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='registration_key',
+            field=models.CharField(default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(fill_registration_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['registration_key'], name='car_registration_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
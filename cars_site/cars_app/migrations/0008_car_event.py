@@ -0,0 +1,29 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0007_car_registration_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('car_id', models.IntegerField()),
+                ('registration_number', models.CharField(max_length=15)),
+                ('max_passengers', models.PositiveIntegerField()),
+                ('year_of_manufacture', models.PositiveIntegerField()),
+                ('manufacturer', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=20)),
+                ('category', models.CharField(max_length=30)),
+                ('motor_type', models.CharField(max_length=40)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0008_car_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCar',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('registration_number', models.CharField(max_length=15)),
+                ('max_passengers', models.PositiveIntegerField()),
+                ('year_of_manufacture', models.PositiveIntegerField()),
+                ('manufacturer', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=20)),
+                ('category', models.CharField(choices=[('economy', 'Economy'), ('business', 'Business'), ('first class', 'First Class')], max_length=30)),
+                ('motor_type', models.CharField(choices=[('hybrid', 'Hybrid'), ('electric', 'Electric')], max_length=40)),
+                ('registration_key', models.CharField(editable=False, max_length=15)),
+                ('archived_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedcar',
+            index=models.Index(fields=['registration_key'], name='archived_car_reg_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars_app', '0009_archived_car'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedcar',
+            name='manufacturer',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='archivedcar',
+            name='max_passengers',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedcar',
+            name='registration_number',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='archivedcar',
+            name='year_of_manufacture',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import re
 from datetime import datetime
 
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
@@ -15,6 +16,42 @@ class MotorTypeChoices(models.TextChoices):
     ELECTRIC = "electric"
 
 
+_REGISTRATION_NUMBER_SEPARATORS = re.compile(r"[ .\-]")
+
+
+def normalize_registration_number(registration_number):
+    """Get key of the registration number, the same for all its spellings, e.g.
+    "AB-123", "ab 123" and "AB.123"."""
+
+    return _REGISTRATION_NUMBER_SEPARATORS.sub("", registration_number).upper()
+
+
+class CarQuerySet(models.QuerySet):
+    """Queryset keeping the registration key of the cars in sync, also in bulk
+    writes, which don't call `Car.save`."""
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get("registration_number"), str):
+            kwargs["registration_key"] = normalize_registration_number(
+                kwargs["registration_number"]
+            )
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for car in objs:
+            car.set_registration_key()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if "registration_number" in fields:
+            objs = list(objs)
+            for car in objs:
+                car.set_registration_key()
+            fields = [*fields, "registration_key"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class Car(models.Model):
     _MIN_MAX_PASSENGERS = 1
     _MAX_MAX_PASSENGERS = 60
@@ -22,7 +59,7 @@ class Car(models.Model):
     _MAX_YEAR_OF_MANUFACTURE = datetime.now().year
     _REGISTRATION_NUMBER_FORMAT = r"^[A-Za-z0-9 \.\-]{3,}$"
 
-    objects = models.Manager()
+    objects = CarQuerySet.as_manager()
 
     registration_number = models.fields.CharField(
         max_length=15,
@@ -31,6 +68,7 @@ class Car(models.Model):
         default=None,
     )
     max_passengers = models.fields.PositiveIntegerField(
+        db_index=True,
         validators=[
             MinValueValidator(
                 _MIN_MAX_PASSENGERS,
@@ -43,6 +81,7 @@ class Car(models.Model):
         ],
     )
     year_of_manufacture = models.fields.PositiveIntegerField(
+        db_index=True,
         validators=[
             MinValueValidator(
                 _MIN_YEAR_OF_MANUFACTURE,
@@ -54,7 +93,7 @@ class Car(models.Model):
             ),
         ],
     )
-    manufacturer = models.fields.CharField(max_length=20, default=None)
+    manufacturer = models.fields.CharField(max_length=20, default=None, db_index=True)
     model = models.fields.CharField(max_length=20, default=None)
     category = models.CharField(
         choices=CarCategoryChoices.choices, max_length=30, default=None
@@ -62,3 +101,92 @@ class Car(models.Model):
     motor_type = models.CharField(
         choices=MotorTypeChoices.choices, max_length=40, default=None
     )
+    # Incremented on every update, for optimistic concurrency control.
+    version = models.fields.PositiveIntegerField(default=1, editable=False)
+    # Normalized registration number, for lookups of plates however they are spelled.
+    registration_key = models.fields.CharField(
+        max_length=15, default="", editable=False
+    )
+
+    class Meta:
+        indexes = [
+            # Pattern operators make the index usable also for prefix lookups on
+            # PostgreSQL. Other databases ignore them.
+            models.Index(
+                fields=["registration_key"],
+                name="car_registration_key_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.set_registration_key()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "registration_number" in update_fields:
+            kwargs["update_fields"] = [*update_fields, "registration_key"]
+        super().save(*args, **kwargs)
+
+    def set_registration_key(self):
+        if self.registration_number is not None:
+            self.registration_key = normalize_registration_number(
+                self.registration_number
+            )
+
+
+class CarEventTypes(models.TextChoices):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+class CarEvent(models.Model):
+    """Change of a car, with its fields after the change (before it, for deletions).
+
+    Events are kept for CARS_EVENTS_RETENTION seconds, for subscribers of car:events.
+    """
+
+    objects = models.Manager()
+
+    type = models.fields.CharField(choices=CarEventTypes.choices, max_length=10)
+    created_at = models.fields.DateTimeField(db_index=True)
+    # Not a foreign key, as events outlive deleted cars.
+    car_id = models.fields.IntegerField()
+    registration_number = models.fields.CharField(max_length=15)
+    max_passengers = models.fields.PositiveIntegerField()
+    year_of_manufacture = models.fields.PositiveIntegerField()
+    manufacturer = models.fields.CharField(max_length=20)
+    model = models.fields.CharField(max_length=20)
+    category = models.CharField(max_length=30)
+    motor_type = models.CharField(max_length=40)
+
+
+class ArchivedCar(models.Model):
+    """Car moved out of the Car table, with the id and fields it had there.
+
+    Cars are archived instead of deleted in archive mode, and in bulk by
+    `archive_cars` command, so that the Car table holds only the active ones.
+    """
+
+    objects = models.Manager()
+
+    # Id of the car in the Car table.
+    id = models.fields.IntegerField(primary_key=True)
+    # Not unique, as a registration number can be reused by later cars.
+    registration_number = models.fields.CharField(max_length=15, db_index=True)
+    max_passengers = models.fields.PositiveIntegerField(db_index=True)
+    year_of_manufacture = models.fields.PositiveIntegerField(db_index=True)
+    manufacturer = models.fields.CharField(max_length=20, db_index=True)
+    model = models.fields.CharField(max_length=20)
+    category = models.CharField(choices=CarCategoryChoices.choices, max_length=30)
+    motor_type = models.CharField(choices=MotorTypeChoices.choices, max_length=40)
+    registration_key = models.fields.CharField(max_length=15, editable=False)
+    archived_at = models.fields.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["registration_key"],
+                name="archived_car_reg_key_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
@@ -0,0 +1,146 @@
+"""Profiling of live requests, for authorized clients only.
+
+A single request is profiled with cProfile when it has X-Profile header with the
+CARS_PROFILING_TOKEN (or any value, for staff users). Its response is then replaced by
+the profile, in the format of `pstats` files, loadable by e.g. snakeviz or flameprof.
+
+With CARS_PROFILING_SAMPLE_INTERVAL set, stacks of the threads handling requests are
+also sampled at that interval, in all requests. The sampled stacks are aggregated in
+memory of the process and exported by profiling:samples in the collapsed format of
+flame graph tools (e.g. flamegraph.pl or speedscope).
+"""
+
+import collections
+import contextlib
+import cProfile
+import hmac
+import logging
+import marshal
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+log = logging.getLogger(__file__)
+
+PROFILE_FILE_NAME = "request.prof"
+
+
+def is_profiling_allowed(request, token):
+    """Check if the client of the request can profile it with the token."""
+
+    if token and settings.CARS_PROFILING_TOKEN:
+        if hmac.compare_digest(token.encode(), settings.CARS_PROFILING_TOKEN.encode()):
+            return True
+
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def profiling_exempt(view):
+    """Mark the view as not profiled, also with X-Profile header."""
+
+    view.profiling_exempt = True
+    return view
+
+
+def start_request_profile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def get_profile_response(profiler, response):
+    """Stop the profiler and get response with its profile in place of `response`."""
+
+    try:
+        if response.streaming:
+            # The content is generated while it's read, which has to be profiled too.
+            b"".join(response.streaming_content)
+    finally:
+        profiler.disable()
+
+    profiler.create_stats()
+    profile_response = HttpResponse(
+        marshal.dumps(profiler.stats), content_type="application/octet-stream"
+    )
+    profile_response["Content-Disposition"] = (
+        f'attachment; filename="{PROFILE_FILE_NAME}"'
+    )
+    profile_response["X-Profiled-Status"] = str(response.status_code)
+    return profile_response
+
+
+class StackSampler:
+    """Sampler of stacks of the threads handling requests, counting the same stacks
+    together."""
+
+    def __init__(self):
+        self._threads = set()
+        self._counts = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, interval):
+        """Start sampling every `interval` seconds in a background thread."""
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="stack-sampler", daemon=True
+            )
+        self._thread.start()
+
+    @contextlib.contextmanager
+    def track_current_thread(self):
+        """Sample the current thread inside the block."""
+
+        ident = threading.get_ident()
+        self._threads.add(ident)
+        try:
+            yield
+        finally:
+            self._threads.discard(ident)
+
+    def sample(self):
+        frames = sys._current_frames()
+        stacks = [
+            _get_collapsed_stack(frames[ident])
+            for ident in list(self._threads)
+            if ident in frames
+        ]
+        with self._lock:
+            self._counts.update(stacks)
+
+    def export(self):
+        """Get the sampled stacks, as lines of collapsed stack and its count, and
+        start counting them anew."""
+
+        with self._lock:
+            counts, self._counts = self._counts, collections.Counter()
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sample()
+            except Exception:
+                log.exception("Sampling of stacks failed.")
+
+
+def _get_collapsed_stack(frame):
+    """Get stack of the frame as semicolon separated functions, outermost first."""
+
+    functions = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        functions.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(functions))
+
+
+stack_sampler = StackSampler()
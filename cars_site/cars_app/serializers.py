@@ -1,88 +1,272 @@
 import logging
+import os
+import threading
+from urllib.parse import quote
 
 import requests
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import serializers
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 from .models import Car
 
 log = logging.getLogger(__file__)
 
 
 class CarsInfoCheckApi:
+    """Client of the external vehicles API.
+
+    Concurrent lookups of the same manufacturer are coalesced: only one request per
+    manufacturer is in flight and the other callers wait for its result. When
+    `lock_dir` is given, lookups are also coalesced across processes with a file lock
+    and the results are shared through the Django cache.
+    """
+
     URL = "https://vpic.nhtsa.dot.gov/api/"
+    CACHE_KEY_PREFIX = "cars_app:manufacturer_models:"
 
-    def __init__(self):
-        self._manufacturer_models = None
+    def __init__(self, lock_dir=None, cache_timeout=None):
+        self._lock_dir = lock_dir
+        self._cache_timeout = cache_timeout
+        self._manufacturer_models = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
 
     def get_manufacturer_models(self, manufacturer):
-        if self._manufacturer_models is None:
+        try:
+            return self._manufacturer_models[manufacturer]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if manufacturer in self._manufacturer_models:
+                return self._manufacturer_models[manufacturer]
+
+            call = self._in_flight.get(manufacturer)
+            is_leader = call is None
+            if is_leader:
+                call = self._in_flight[manufacturer] = _InFlightCall()
+
+        if is_leader:
             try:
-                response = requests.get(
-                    f"{self.URL}/vehicles/GetModelsForMake/{manufacturer}",
-                    params={"format": "json"},
-                )
-                response.raise_for_status()
-            except requests.exceptions.HTTPError:
-                log.exception(
-                    "External API signaled a problem. Check status code for further "
-                    "information. Aborting."
-                )
-            except requests.exceptions.RequestException:
-                log.exception(
-                    "An exception occurred while making request to external API: {}. Aborting.".format(
-                        self.URL
-                    )
-                )
-            else:
-                results = response.json()["Results"]
-                self._manufacturer_models = self._format_manufacturer_models(results)
+                call.result = self._get_shared_manufacturer_models(manufacturer)
+            finally:
+                with self._lock:
+                    if call.result is not None:
+                        self._manufacturer_models[manufacturer] = call.result
+                    del self._in_flight[manufacturer]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        return call.result
+
+    def _get_shared_manufacturer_models(self, manufacturer):
+        """Fetch models, coalescing the request with other processes if configured."""
+
+        if self._lock_dir is None or fcntl is None:
+            return self._fetch_manufacturer_models(manufacturer)
+
+        cache_key = self.CACHE_KEY_PREFIX + quote(str(manufacturer), safe="")
+        lock_path = os.path.join(
+            self._lock_dir,
+            "manufacturer-{}.lock".format(quote(str(manufacturer), safe="")),
+        )
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                manufacturer_models = cache.get(cache_key)
+                if manufacturer_models is None:
+                    manufacturer_models = self._fetch_manufacturer_models(manufacturer)
+                    if manufacturer_models is not None:
+                        cache.set(cache_key, manufacturer_models, self._cache_timeout)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-        return self._manufacturer_models
+        return manufacturer_models
+
+    def _fetch_manufacturer_models(self, manufacturer):
+        try:
+            response = requests.get(
+                f"{self.URL}/vehicles/GetModelsForMake/{manufacturer}",
+                params={"format": "json"},
+            )
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            log.exception(
+                "External API signaled a problem. Check status code for further "
+                "information. Aborting."
+            )
+        except requests.exceptions.RequestException:
+            log.exception(
+                "An exception occurred while making request to external API: {}. Aborting.".format(
+                    self.URL
+                )
+            )
+        else:
+            results = response.json()["Results"]
+            return self._format_manufacturer_models(results)
 
     @staticmethod
     def _format_manufacturer_models(data):
         return [model["Model_Name"] for model in data]
 
 
+class _InFlightCall:
+    """Result of an upstream request shared between the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+def get_manufacturer_model_error(manufacturer, model, manufacturer_models):
+    """Get error message if model is not one of the manufacturer models, else None."""
+
+    if manufacturer and not manufacturer_models:
+        return "This manufacturer does not exist."
+    elif model and model not in (manufacturer_models or ()):
+        return "There is no such model for this manufacturer"
+    else:
+        return None
+
+
 class GeneralCarSerializer(serializers.ModelSerializer):
     """Serializer for all fields of a Car model."""
 
     class Meta:
         model = Car
-        fields = "__all__"
+        exclude = ["registration_key"]
 
     def __init__(self, info_api, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.info_api = info_api
 
+    def get_fields(self):
+        """Get copies of the fields built once per serializer class.
+
+        Building the fields of a model serializer introspects the model, which is
+        much slower than copying them. Fields are copied like with `copy.deepcopy`,
+        but their arguments are shared, as fields don't modify them.
+        """
+
+        cls = type(self)
+        if "_fields_prototype" not in cls.__dict__:
+            cls._fields_prototype = super().get_fields()
+
+        return {
+            name: type(field)(*field._args, **field._kwargs)
+            for name, field in cls._fields_prototype.items()
+        }
+
     def validate(self, data):
-        manufacturer = data.get("manufacturer")
-        model = data.get("model")
+        self._validate_manufacturer_model(data.get("manufacturer"), data.get("model"))
+        return data
+
+    def _validate_manufacturer_model(self, manufacturer, model):
         manufacturer_models = self.info_api.get_manufacturer_models(manufacturer)
 
-        if manufacturer and not manufacturer_models:
-            raise serializers.ValidationError("This manufacturer does not exist.")
-        elif model and not any([result == model for result in manufacturer_models]):
-            raise serializers.ValidationError(
-                "There is no such model for this manufacturer"
-            )
-        else:
-            return data
+        error = get_manufacturer_model_error(manufacturer, model, manufacturer_models)
+        if error:
+            raise serializers.ValidationError(error)
 
 
 class CarUpdateSerializer(GeneralCarSerializer):
-    """Serializer for fields needed for Car resource update."""
+    """Serializer for fields needed for Car resource update.
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._set_all_fields_except_pk_as_not_required()
+    Only the sent fields are validated. The instance doesn't need to be fetched from
+    the database, an unsaved one with the pk of the updated car is enough.
+    """
 
-    def _set_all_fields_except_pk_as_not_required(self):
-        for field_name, field in self.fields.items():
-            if field_name != "pk":
-                field.required = False
+    class Meta(GeneralCarSerializer.Meta):
+        extra_kwargs = {
+            field.name: {"required": False} for field in Car._meta.concrete_fields
+        }
+
+    def validate(self, data):
+        if "manufacturer" not in data and "model" not in data:
+            return data
+
+        manufacturer_model = {
+            "manufacturer": data.get("manufacturer"),
+            "model": data.get("model"),
+        }
+        if "manufacturer" not in data or "model" not in data:
+            # The sent value has to be checked against the current one of the other.
+            current = (
+                Car.objects.filter(pk=self.instance.pk)
+                .values("manufacturer", "model")
+                .first()
+            )
+            if current is not None:
+                manufacturer_model = {**current, **data}
+
+        self._validate_manufacturer_model(
+            manufacturer_model["manufacturer"], manufacturer_model["model"]
+        )
+        return data
 
 
 class FlagSerializer(serializers.Serializer):
     show_category = serializers.BooleanField(required=False, initial=False)
     show_motor_type = serializers.BooleanField(required=False, initial=False)
+
+
+# Cars can be ordered only by indexed fields, so that top N of them are read from the
+# index instead of sorting all of them.
+ORDERING_FIELDS = [
+    field.name for field in Car._meta.concrete_fields if field.db_index or field.unique
+]
+
+
+class ListOptionsSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(
+        choices=["json", "compact", "columnar"], required=False, default="json"
+    )
+    ordering = serializers.ChoiceField(
+        choices=[*ORDERING_FIELDS, *[f"-{name}" for name in ORDERING_FIELDS]],
+        required=False,
+    )
+    limit = serializers.IntegerField(required=False, min_value=1)
+    count = serializers.BooleanField(required=False, default=False)
+    exists = serializers.BooleanField(required=False, default=False)
+    approximate = serializers.BooleanField(required=False, default=False)
+
+    def validate_limit(self, value):
+        if value > settings.CARS_LIST_MAX_LIMIT:
+            raise serializers.ValidationError(
+                f"Limit can't be greater than {settings.CARS_LIST_MAX_LIMIT}."
+            )
+        return value
+
+    def validate(self, data):
+        if "ordering" in data and "limit" not in data:
+            raise serializers.ValidationError("Ordering requires a limit.")
+        if data["count"] and data["exists"]:
+            raise serializers.ValidationError("Count and exists can't be combined.")
+        return data
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    operation = serializers.ChoiceField(choices=["retrieve", "add", "update", "delete"])
+    # Query parameters of car:retrieve.
+    params = serializers.DictField(required=False, default=dict)
+    # Body of car:add, car:update and car:delete.
+    data = serializers.DictField(required=False, default=dict)
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, value):
+        if len(value) > settings.CARS_BATCH_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                f"Batch can't have more than {settings.CARS_BATCH_MAX_OPERATIONS} "
+                "operations."
+            )
+        return value
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with `ids` argument after cars are changed with a queryset update, which doesn't
+# send post_save signal.
+cars_updated = Signal()
@@ -0,0 +1,387 @@
+"""In-memory copy of all cars, for filtering them without database queries.
+
+Rows have fixed positions in the columns. The columns with few distinct values
+(everything except id, registration number and model) are dictionary encoded and
+indexed with a bitmap of row positions per distinct value, kept as Python ints, so
+combinations of filters are answered with a few bitwise OR and AND operations on
+them, which run in C.
+
+The snapshot is loaded on the first use, then refreshed car by car after changes
+signalled in this process, and reloaded whole once it is older than
+CARS_LIST_SNAPSHOT_MAX_AGE seconds, to pick up changes made by other processes.
+"""
+
+import heapq
+import threading
+import time
+from array import array
+from itertools import compress
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .exporting import iter_chunks
+from .filters import get_filter_predicates
+from .models import Car
+from .signals import cars_updated
+
+# Columns in the order of the Car model fields.
+COLUMNS = [
+    "id",
+    "registration_number",
+    "max_passengers",
+    "year_of_manufacture",
+    "manufacturer",
+    "model",
+    "category",
+    "motor_type",
+]
+_INDEXED_COLUMNS = [
+    "max_passengers",
+    "year_of_manufacture",
+    "manufacturer",
+    "category",
+    "motor_type",
+]
+
+
+# Filters of CarFilter which can be answered from the snapshot, with their columns and
+# comparison operators.
+_PREDICATES = {
+    name: (field_name, operator_)
+    for name, (field_name, operator_) in get_filter_predicates().items()
+    if field_name in _INDEXED_COLUMNS
+}
+
+# Positions of the set bits of each byte value.
+_BYTE_BITS = [[bit for bit in range(8) if byte >> bit & 1] for byte in range(256)]
+
+
+def get_bitmap_positions(bitmap, size):
+    """Get sorted positions of the set bits of a bitmap of `size` bits."""
+
+    data = bitmap.to_bytes((size + 7) // 8, "little")
+    offsets = compress(range(0, len(data) * 8, 8), data)
+    return [
+        offset + bit
+        for offset, byte in zip(offsets, compress(data, data))
+        for bit in _BYTE_BITS[byte]
+    ]
+
+
+class _IndexedColumn:
+    """Dictionary encoded column with a bitmap of rows of each of its values."""
+
+    def __init__(self):
+        self.values = []
+        self.bitmaps = []
+        self._codes_of_values = {}
+        # Switched to array of ints if there are more than 256 distinct values.
+        self.codes = bytearray()
+
+    def append(self, value):
+        position = len(self.codes)
+        code = self._encode(value)
+        self.codes.append(code)
+        self.bitmaps[code] ^= 1 << position
+
+    def __setitem__(self, position, value):
+        old_code = self.codes[position]
+        code = self._encode(value)
+        if code != old_code:
+            # Only the bit of the row in bitmaps of its old and new value is toggled.
+            # Unlike AND with the complement of the bit, XOR doesn't need a negative
+            # int as long as the bitmap.
+            bit = 1 << position
+            self.bitmaps[old_code] ^= bit
+            self.bitmaps[code] ^= bit
+            self.codes[position] = code
+
+    def clear(self, position):
+        """Remove the row from the bitmap of its value. It must not be removed
+        already."""
+
+        self.bitmaps[self.codes[position]] ^= 1 << position
+
+    def get_values(self, positions):
+        return list(
+            map(self.values.__getitem__, map(self.codes.__getitem__, positions))
+        )
+
+    def get_bitmap(self, operator_, value):
+        """Get bitmap of rows whose value is in relation `operator_` to `value`."""
+
+        bitmap = 0
+        for column_value, value_bitmap in zip(self.values, self.bitmaps):
+            if operator_(column_value, value):
+                bitmap |= value_bitmap
+        return bitmap
+
+    @classmethod
+    def from_values(cls, values):
+        """Build the column at once, which is faster than appending the rows."""
+
+        column = cls()
+        # Encoded first, as the type of the codes depends on the number of values.
+        codes = list(map(column._encode, values))
+        if len(column.values) > 256:
+            column.codes = array("I", codes)
+        else:
+            column.codes = bytearray(codes)
+        positions = [[] for _ in column.values]
+        for position, code in enumerate(column.codes):
+            positions[code].append(position)
+
+        size = len(column.codes)
+        for code, value_positions in enumerate(positions):
+            data = bytearray((size + 7) // 8)
+            for position in value_positions:
+                data[position >> 3] |= 1 << (position & 7)
+            column.bitmaps[code] = int.from_bytes(data, "little")
+        return column
+
+    def _encode(self, value):
+        try:
+            return self._codes_of_values[value]
+        except KeyError:
+            code = self._codes_of_values[value] = len(self.values)
+            self.values.append(value)
+            self.bitmaps.append(0)
+            if code == 256:
+                # Converted code by code, as array would read the bytearray as
+                # machine values.
+                self.codes = array("I", list(self.codes))
+            return code
+
+
+class _FleetData:
+    """Columns of the snapshot. Positions of deleted cars are kept until a reload."""
+
+    def __init__(self, rows=()):
+        values = list(zip(*rows)) or [()] * len(COLUMNS)
+        self.columns = {}
+        for name, column_values in zip(COLUMNS, values):
+            if name in _INDEXED_COLUMNS:
+                self.columns[name] = _IndexedColumn.from_values(column_values)
+            else:
+                self.columns[name] = list(column_values)
+        self.positions = {id_: position for position, id_ in enumerate(values[0])}
+        self.size = len(self.positions)
+        # Bitmap of positions of the existing cars.
+        self.live = (1 << self.size) - 1
+        self.loaded_at = time.monotonic()
+
+    def set_row(self, row):
+        position = self.positions.get(row[0])
+        if position is None:
+            position = self.positions[row[0]] = self.size
+            self.size += 1
+            self.live |= 1 << position
+            for name, value in zip(COLUMNS, row):
+                self.columns[name].append(value)
+        else:
+            for name, value in zip(COLUMNS, row):
+                self.columns[name][position] = value
+
+    def delete_row(self, id_):
+        position = self.positions.pop(id_, None)
+        if position is not None:
+            self.live ^= 1 << position
+            for name in _INDEXED_COLUMNS:
+                self.columns[name].clear(position)
+
+    def get_rows(self, positions, fields):
+        columns = []
+        for name in fields:
+            column = self.columns[name]
+            if name in _INDEXED_COLUMNS:
+                columns.append(column.get_values(positions))
+            else:
+                columns.append(list(map(column.__getitem__, positions)))
+        return list(zip(*columns))
+
+
+class FleetSnapshot:
+    def __init__(self):
+        self._data = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Ids of cars changed while the snapshot was being reloaded.
+        self._changed_during_reload = None
+
+    def clear(self):
+        with self._lock:
+            self._data = None
+
+    def filter(self, filters, fields, ordering="id", limit=None):
+        """Get rows of `fields` values of the cars matching the filters.
+
+        `filters` are cleaned data of a valid CarFilter. Returns None if some of them
+        are not supported by the snapshot. With `limit`, only that many first cars in
+        the `ordering` are returned, with ties in the order of ids. Otherwise the order
+        of the cars is not defined.
+        """
+
+        filters = self._get_given_filters(filters)
+        if filters is None:
+            return None
+
+        data = self._get_data()
+        with self._lock:
+            bitmap = self._select(data, filters)
+            if limit is None:
+                positions = get_bitmap_positions(bitmap, data.size)
+            else:
+                positions = self._get_top(data, bitmap, ordering, limit)
+            return data.get_rows(positions, fields)
+
+    def count(self, filters):
+        """Get number of the cars matching the filters.
+
+        Returns None if some of the filters are not supported by the snapshot.
+        """
+
+        filters = self._get_given_filters(filters)
+        if filters is None:
+            return None
+
+        data = self._get_data()
+        with self._lock:
+            return bin(self._select(data, filters)).count("1")
+
+    @staticmethod
+    def _get_given_filters(filters):
+        """Get the filters with values, or None if some of them are not supported."""
+
+        filters = {
+            name: value for name, value in filters.items() if value not in (None, "")
+        }
+        if not filters.keys() <= _PREDICATES.keys():
+            return None
+        return filters
+
+    @staticmethod
+    def _select(data, filters):
+        """Get bitmap of live rows matching all the filters."""
+
+        bitmap = data.live
+        for name, value in filters.items():
+            column_name, operator_ = _PREDICATES[name]
+            bitmap &= data.columns[column_name].get_bitmap(operator_, value)
+
+        return bitmap
+
+    @staticmethod
+    def _get_top(data, bitmap, ordering, limit):
+        """Get positions of first `limit` rows of the bitmap in the ordering."""
+
+        descending = ordering.startswith("-")
+        column = data.columns[ordering.lstrip("-")]
+        ids = data.columns["id"]
+
+        if not isinstance(column, _IndexedColumn):
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return select(
+                limit,
+                get_bitmap_positions(bitmap, data.size),
+                key=lambda position: (column[position], ids[position]),
+            )
+
+        # Rows are taken from bitmaps of the column values in the ordering, until
+        # there are enough of them.
+        top = []
+        for code in sorted(
+            range(len(column.values)), key=column.values.__getitem__, reverse=descending
+        ):
+            positions = get_bitmap_positions(column.bitmaps[code] & bitmap, data.size)
+            positions.sort(key=ids.__getitem__, reverse=descending)
+            top.extend(positions[: limit - len(top)])
+            if len(top) == limit:
+                break
+        return top
+
+    def _get_data(self):
+        data = self._data
+        if (
+            data is not None
+            and time.monotonic() - data.loaded_at <= settings.CARS_LIST_SNAPSHOT_MAX_AGE
+        ):
+            return data
+
+        if data is None:
+            self._reload_lock.acquire()
+        elif not self._reload_lock.acquire(blocking=False):
+            # Another thread is reloading, use the outdated data in the meantime.
+            return data
+        try:
+            if self._data is not data:
+                return self._data
+            return self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self):
+        with self._lock:
+            self._changed_during_reload = set()
+
+        # Cars are read without holding the lock, so the old data can be used by
+        # other threads in the meantime.
+        data = _FleetData(
+            row
+            for rows in iter_chunks(
+                Car.objects.all(), COLUMNS, settings.CARS_LIST_CHUNK_SIZE
+            )
+            for row in rows
+        )
+
+        with self._lock:
+            self._data = data
+            changed, self._changed_during_reload = self._changed_during_reload, None
+        if changed:
+            self.refresh_cars(changed)
+
+        return data
+
+    def refresh_cars(self, ids):
+        """Reload the given cars from the database."""
+
+        with self._lock:
+            if self._changed_during_reload is not None:
+                self._changed_during_reload.update(ids)
+            if self._data is None:
+                return
+
+        rows = list(Car.objects.filter(id__in=ids).values_list(*COLUMNS))
+
+        with self._lock:
+            if self._data is None:
+                return
+            for row in rows:
+                self._data.set_row(row)
+            for id_ in set(ids) - {row[0] for row in rows}:
+                self._data.delete_row(id_)
+
+
+fleet_snapshot = FleetSnapshot()
+
+
+def _refresh_on_commit(ids):
+    if settings.CARS_LIST_SNAPSHOT:
+        transaction.on_commit(lambda: fleet_snapshot.refresh_cars(ids))
+
+
+@receiver(post_save, sender=Car)
+def _refresh_saved_car(sender, instance, **kwargs):
+    _refresh_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Car)
+def _refresh_deleted_car(sender, instance, **kwargs):
+    _refresh_on_commit([instance.pk])
+
+
+@receiver(cars_updated, sender=Car)
+def _refresh_updated_cars(sender, ids, **kwargs):
+    _refresh_on_commit(ids)
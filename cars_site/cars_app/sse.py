@@ -0,0 +1,216 @@
+"""car:events endpoint, streaming changes of cars as server-sent events.
+
+It is an ASGI application wrapping the Django one in `cars_site/asgi.py`, as each
+subscriber keeps a long-lived connection, which would occupy a worker thread in
+Django. A single broker per process polls the events table and passes new events to
+the subscribers of the process.
+
+    GET /car:events?<car:list filters>
+    Last-Event-ID: <id of the last received event, to resume after it>
+"""
+
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import QueryDict
+
+from .events import (
+    delete_old_events,
+    fetch_events,
+    format_event,
+    get_event_matcher,
+    get_last_event_id,
+)
+
+log = logging.getLogger(__file__)
+
+PATH = "/car:events"
+# Seconds between comments sent to keep idle connections open.
+HEARTBEAT_INTERVAL = 15
+# Seconds for which a gap in event ids is waited for, as transactions with lower ids
+# may commit after ones with higher ids. Gaps are also left by rolled back
+# transactions, so they are skipped after this time.
+GAP_TIMEOUT = 2
+# Events buffered for a subscriber. Subscribers which don't keep up are disconnected,
+# to resume from the last received event.
+SUBSCRIBER_QUEUE_SIZE = 1000
+_DISCONNECTED = object()
+
+
+class CarEventBroker:
+    """Poller of new events passing them to the subscribers, in order of ids."""
+
+    def __init__(self):
+        self.last_id = None
+        self._subscribers = set()
+        self._task = None
+        self._gap_since = None
+        self._old_events_deleted_at = 0
+
+    async def subscribe(self):
+        """Get queue of new events. Events with ids up to `last_id` at the time of
+        subscription are not passed to it."""
+
+        if self._task is None or self._task.done():
+            self.last_id = await sync_to_async(get_last_event_id)()
+            self._task = asyncio.ensure_future(self._poll())
+
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def _poll(self):
+        while self._subscribers:
+            try:
+                events = await sync_to_async(fetch_events)(self.last_id)
+                self._publish(self._get_ready_events(events))
+                await self._delete_old_events()
+            except Exception:
+                log.exception("Polling of car events failed.")
+            await asyncio.sleep(settings.CARS_EVENTS_POLL_INTERVAL)
+        self._task = None
+
+    def _get_ready_events(self, events):
+        """Get events which can be passed on, stopping at a gap in ids."""
+
+        ready = []
+        for event in events:
+            if event.id != self.last_id + 1:
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                if time.monotonic() - self._gap_since < GAP_TIMEOUT:
+                    break
+            self._gap_since = None
+            ready.append(event)
+            self.last_id = event.id
+        return ready
+
+    def _publish(self, events):
+        for queue in list(self._subscribers):
+            for event in events:
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._subscribers.discard(queue)
+                    queue.put_nowait(_DISCONNECTED)
+                    break
+
+    async def _delete_old_events(self):
+        if time.monotonic() - self._old_events_deleted_at > 60 * 60:
+            self._old_events_deleted_at = time.monotonic()
+            await sync_to_async(delete_old_events)()
+
+
+broker = CarEventBroker()
+
+
+class CarEventsApplication:
+    """ASGI application handling car:events and passing other requests to Django."""
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != PATH or not settings.CARS_EVENTS:
+            return await self.django_application(scope, receive, send)
+
+        if scope["method"] != "GET":
+            return await _send_response(send, 405, b"Method not allowed.")
+
+        headers = dict(scope["headers"])
+        params = QueryDict(scope["query_string"])
+        try:
+            matches = get_event_matcher(params)
+            last_event_id = int(headers.get(b"last-event-id", b"").strip() or -1)
+        except ValueError as e:
+            return await _send_response(send, 400, str(e).encode())
+
+        await _stream(receive, send, matches, last_event_id)
+
+
+async def _stream(receive, send, matches, last_event_id):
+    queue = await broker.subscribe()
+    # Events up to this id are not passed to the queue, they are read from the table.
+    subscribed_after_id = broker.last_id
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await _send_body(send, b": connected\n\n")
+
+        if last_event_id >= 0:
+            while last_event_id < subscribed_after_id:
+                events = await sync_to_async(fetch_events)(
+                    last_event_id, until_id=subscribed_after_id
+                )
+                if not events:
+                    break
+                await _send_events(send, events, matches)
+                last_event_id = events[-1].id
+
+        while not disconnected.done():
+            get_event = asyncio.ensure_future(queue.get())
+            await asyncio.wait(
+                [get_event, disconnected],
+                timeout=HEARTBEAT_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not get_event.done():
+                get_event.cancel()
+                if not disconnected.done():
+                    await _send_body(send, b": keep-alive\n\n")
+                continue
+
+            events = [get_event.result()]
+            while not queue.empty():
+                events.append(queue.get_nowait())
+            if _DISCONNECTED in events:
+                break
+            await _send_events(send, events, matches)
+
+        await _send_body(send, b"", more_body=False)
+    finally:
+        broker.unsubscribe(queue)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_events(send, events, matches):
+    body = b"".join(format_event(event) for event in events if matches(event))
+    if body:
+        await _send_body(send, body)
+
+
+async def _send_body(send, body, more_body=True):
+    await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+async def _send_response(send, status, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await _send_body(send, body, more_body=False)
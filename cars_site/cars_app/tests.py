@@ -1,9 +1,45 @@
+import asyncio
+import csv
+import gzip
+import json
+import marshal
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from io import StringIO
 from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.forms import model_to_dict
-from django.test import TestCase
-
-from .models import Car
+from django.http import QueryDict
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from .archiving import archive_cars
+from .columnar import read_columnar
+from .events import get_event_matcher
+from .fleet import STUB_CATALOG
+from .importing import save_checkpoint
+from .models import ArchivedCar, Car, CarEvent
+from .profiling import StackSampler
+from .serializers import CarsInfoCheckApi
+from .snapshot import _IndexedColumn, fleet_snapshot, get_bitmap_positions
+from .sse import CarEventsApplication
+from .throttling import DeleteCarRateThrottle, _get_write_slots
 
 EXAMPLE_CAR_DATA = {
     "registration_number": "asdf-123",
@@ -34,6 +70,38 @@ EXAMPLE_CAR_DATA3 = {
 }
 
 
+class TestCarRegistrationKey(TestCase):
+    def test_key_is_kept_in_sync_with_registration_number(self):
+        car = Car.objects.create(**{**EXAMPLE_CAR_DATA, "registration_number": "ab-1"})
+        self.assertEqual(car.registration_key, "AB1")
+
+        car.registration_number = "cd 2"
+        car.save(update_fields=["registration_number"])
+        car.refresh_from_db()
+        self.assertEqual(car.registration_key, "CD2")
+
+        Car.objects.filter(pk=car.pk).update(registration_number="e.f-3")
+        car.refresh_from_db()
+        self.assertEqual(car.registration_key, "EF3")
+
+        car.registration_number = "gh4"
+        Car.objects.bulk_update([car], ["registration_number"])
+        Car.objects.bulk_create(
+            [Car(**{**EXAMPLE_CAR_DATA2, "registration_number": "ij 5"})]
+        )
+        self.assertEqual(
+            list(Car.objects.values_list("registration_key", flat=True)),
+            ["GH4", "IJ5"],
+        )
+
+    def test_key_is_not_a_part_of_representation(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.get("/car:retrieve", data={"id": car.pk})
+
+        self.assertNotIn("registration_key", response.json())
+
+
 class TestGetCarView(TestCase):
     def setUp(self) -> None:
         self.url = "/car:retrieve"
@@ -225,6 +293,195 @@ class TestCarsListView(TestCase):
 
         self.assertEqual(len(economy_cars), 1)
 
+    def test_ranges_and_lists_of_values_are_filtered_in_single_query(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car2 = Car.objects.create(
+            **{**EXAMPLE_CAR_DATA2, "manufacturer": "c", "category": "business"}
+        )
+        Car.objects.create(**{**EXAMPLE_CAR_DATA3, "manufacturer": "d"})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url,
+                data={
+                    "manufacturer__in": "b,c",
+                    "max_passengers__range": "4,7",
+                    "year_of_manufacture__gte": 2000,
+                    "year_of_manufacture__lte": 2001,
+                },
+            )
+        self.assertEqual([car["pk"] for car in response.json()], [car.pk, car2.pk])
+
+        response = self.client.get(
+            self.url, data={"category__in": "business,first class"}
+        )
+        self.assertEqual([car["pk"] for car in response.json()], [car2.pk])
+
+        response = self.client.get(
+            self.url, data={"category": "economy", "year_of_manufacture__in": "2002"}
+        )
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]["fields"]["manufacturer"], "d")
+
+    def test_top_cars_are_listed_in_ordering(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+        car3 = Car.objects.create(**{**EXAMPLE_CAR_DATA3, "year_of_manufacture": 2001})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, data={"ordering": "-year_of_manufacture", "limit": 2}
+            )
+        self.assertEqual([car["pk"] for car in response.json()], [car3.pk, car2.pk])
+
+        response = self.client.get(
+            self.url,
+            data={"ordering": "registration_number", "limit": 5, "format": "compact"},
+        )
+        self.assertEqual(
+            [row[0] for row in response.json()["rows"]], [car2.pk, car.pk, car3.pk]
+        )
+
+    def test_returns_error_code_when_ordering_is_invalid(self):
+        for params in [
+            {"ordering": "year_of_manufacture"},
+            {"ordering": "model", "limit": 10},
+            {"limit": 0},
+            {"limit": 1001},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, data=params)
+                self.assertEqual(response.status_code, 422)
+
+    def test_cars_can_be_filtered_by_plate_however_spelled(self):
+        car = Car.objects.create(
+            **{**EXAMPLE_CAR_DATA, "registration_number": "AB-123"}
+        )
+        car2 = Car.objects.create(
+            **{**EXAMPLE_CAR_DATA2, "registration_number": "ab 124"}
+        )
+        Car.objects.create(**{**EXAMPLE_CAR_DATA3, "registration_number": "XA.123"})
+
+        response = self.client.get(self.url, data={"plate": "ab.123"})
+        self.assertEqual([car["pk"] for car in response.json()], [car.pk])
+
+        response = self.client.get(self.url, data={"plate__startswith": "a-b 12"})
+        self.assertEqual([car["pk"] for car in response.json()], [car.pk, car2.pk])
+
+    def test_filtered_cars_can_be_counted(self):
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+        Car.objects.create(**EXAMPLE_CAR_DATA2)
+        Car.objects.create(**EXAMPLE_CAR_DATA3)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, data={"count": True, "max_passengers": 5}
+            )
+        self.assertEqual(response.json(), {"count": 2, "approximate": False})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, data={"exists": True, "max_passengers__gt": 6}
+            )
+        self.assertEqual(response.json(), {"exists": False})
+
+        response = self.client.get(self.url, data={"count": True, "exists": True})
+        self.assertEqual(response.status_code, 422)
+
+    @patch("cars_app.counting._get_estimated_count")
+    def test_large_counts_can_be_approximate(self, get_estimated_count_mock):
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        get_estimated_count_mock.return_value = 123456
+        response = self.client.get(self.url, data={"count": True, "approximate": True})
+        self.assertEqual(response.json(), {"count": 123456, "approximate": True})
+
+        # Small estimates are not accurate enough.
+        get_estimated_count_mock.return_value = 10
+        response = self.client.get(self.url, data={"count": True, "approximate": True})
+        self.assertEqual(response.json(), {"count": 1, "approximate": False})
+
+    def test_cars_can_be_listed_in_compact_format(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+
+        response = self.client.get(
+            self.url, data={"format": "compact", "show_category": True}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        fields = list(model_to_dict(car, exclude=["motor_type"]).keys())
+        self.assertEqual(
+            response.json(),
+            {
+                "fields": fields,
+                "rows": [
+                    list(model_to_dict(car, fields=fields).values()),
+                    list(model_to_dict(car2, fields=fields).values()),
+                ],
+            },
+        )
+
+    def test_cars_can_be_listed_in_columnar_format(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+        Car.objects.create(**EXAMPLE_CAR_DATA3)
+
+        response = self.client.get(
+            self.url,
+            data={"format": "columnar", "show_category": True, "max_passengers": 5},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.cars.columnar")
+        schema, columns = read_columnar(b"".join(response.streaming_content))
+        self.assertEqual(
+            schema["columns"],
+            [
+                {"name": "id", "type": "int64"},
+                {"name": "registration_number", "type": "utf8"},
+                {"name": "max_passengers", "type": "uint32"},
+                {"name": "year_of_manufacture", "type": "uint32"},
+                {"name": "manufacturer", "type": "utf8"},
+                {"name": "model", "type": "utf8"},
+                {"name": "category", "type": "dictionary"},
+            ],
+        )
+        self.assertEqual(list(columns["id"]), [car.pk, car2.pk])
+        self.assertEqual(list(columns["year_of_manufacture"]), [2000, 2001])
+        self.assertEqual(columns["category"], ["economy", "economy"])
+
+    def test_returns_error_code_when_format_is_unknown(self):
+        response = self.client.get(self.url, data={"format": "xml"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_large_list_is_compressed_when_client_accepts_it(self):
+        for i in range(20):
+            Car.objects.create(**{**EXAMPLE_CAR_DATA, "registration_number": f"X-{i}"})
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 20)
+
+    @patch("cars_app.middleware.brotli")
+    def test_large_list_is_compressed_with_brotli_if_available(self, brotli_mock):
+        brotli_mock.compress.side_effect = lambda content: b"compressed"
+        for i in range(20):
+            Car.objects.create(**{**EXAMPLE_CAR_DATA, "registration_number": f"X-{i}"})
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response.content, b"compressed")
+
+    def test_small_list_is_not_compressed(self):
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+
 
 class TestAddCarView(TestCase):
     def setUp(self) -> None:
@@ -519,6 +776,96 @@ class TestUpdateCarView(TestCase):
         self.assertEqual(response.status_code, 422)
         self.assertEqual(Car.objects.get(pk=car.pk).manufacturer, "Volkswagen")
 
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_car_is_updated_when_version_matches(self, get_models):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        etag = self.client.get("/car:retrieve", data={"id": car.pk})["ETag"]
+
+        response = self.client.post(
+            self.url,
+            data={"pk": car.pk, "max_passengers": 4},
+            content_type="application/json",
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response["ETag"], '"2"')
+        car_updated = Car.objects.get(pk=car.pk)
+        self.assertEqual(car_updated.max_passengers, 4)
+        self.assertEqual(car_updated.version, 2)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_concurrent_update_is_rejected_when_version_is_outdated(self, get_models):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.post(
+            self.url,
+            data={"pk": car.pk, "max_passengers": 4, "version": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 204)
+
+        response2 = self.client.post(
+            self.url,
+            data={"pk": car.pk, "max_passengers": 6, "version": 1},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response2.status_code, 409)
+        self.assertEqual(Car.objects.get(pk=car.pk).max_passengers, 4)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_car_cant_be_updated_with_invalid_version(self, get_models):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.post(
+            self.url,
+            data={"pk": car.pk, "max_passengers": 4},
+            content_type="application/json",
+            HTTP_IF_MATCH='"abc"',
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Car.objects.get(pk=car.pk).max_passengers, 5)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_update_is_a_single_query_without_external_check(self, get_models):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                self.url,
+                data={"pk": car.pk, "max_passengers": 4, "year_of_manufacture": 2010},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 204)
+        get_models.assert_not_called()
+
+    def test_update_of_non_existing_car_is_rejected(self):
+        response = self.client.post(
+            self.url,
+            data={"pk": 99999, "max_passengers": 4},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 422)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_updated_model_is_checked_against_current_manufacturer(self, get_models):
+        get_models.return_value = ["a", "c"]
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.post(
+            self.url,
+            data={"pk": car.pk, "model": "c"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 204)
+        get_models.assert_called_once_with(car.manufacturer)
+        self.assertEqual(Car.objects.get(pk=car.pk).model, "c")
+
 
 class TestDeleteCarView(TestCase):
     def setUp(self) -> None:
@@ -557,3 +904,1056 @@ class TestDeleteCarView(TestCase):
 
         self.assertEqual(response.status_code, 422)
         self.assertEqual(len(Car.objects.all()), 1)
+
+    @override_settings(CARS_ARCHIVE=True)
+    def test_car_is_moved_to_archive_in_archive_mode(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        response = self.client.post(self.url, data={"pk": car.pk})
+        response2 = self.client.post(self.url, data={"pk": car.pk})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response2.status_code, 422)
+        self.assertFalse(Car.objects.exists())
+        archived_car = ArchivedCar.objects.get()
+        self.assertEqual(archived_car.id, car.pk)
+        self.assertEqual(archived_car.registration_key, "ASDF123")
+        self.assertEqual(
+            model_to_dict(archived_car, fields=EXAMPLE_CAR_DATA), EXAMPLE_CAR_DATA
+        )
+
+
+class TestArchivedCarsListView(TestCase):
+    def setUp(self) -> None:
+        self.url = "/car:archive"
+        self.car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        self.car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+        archive_cars(Car.objects.all())
+
+    def test_archived_cars_are_listed_with_filters(self):
+        response = self.client.get(self.url, data={"plate": "ghjk 123"})
+
+        self.assertEqual(response.status_code, 200)
+        [car] = response.json()
+        self.assertEqual(car["model"], "cars_app.archivedcar")
+        self.assertEqual(car["pk"], self.car2.pk)
+        self.assertIn("archived_at", car["fields"])
+        self.assertEqual(self.client.get("/car:list").json(), [])
+
+    def test_archived_cars_can_be_listed_in_columnar_format(self):
+        response = self.client.get(self.url, data={"format": "columnar"})
+
+        self.assertEqual(response.status_code, 200)
+        schema, columns = read_columnar(b"".join(response.streaming_content))
+        self.assertEqual(schema["columns"][0], {"name": "id", "type": "int64"})
+        self.assertEqual(schema["columns"][-1], {"name": "archived_at", "type": "utf8"})
+        self.assertEqual(list(columns["id"]), [self.car.pk, self.car2.pk])
+        archived_at = ArchivedCar.objects.get(pk=self.car.pk).archived_at
+        self.assertEqual(
+            columns["archived_at"][0], DjangoJSONEncoder().default(archived_at)
+        )
+
+    def test_archived_cars_are_filtered_by_time_of_archiving(self):
+        archived_at = ArchivedCar.objects.first().archived_at
+
+        def count(**params):
+            return self.client.get(self.url, data={**params, "count": True}).json()[
+                "count"
+            ]
+
+        self.assertEqual(count(archived_at__gte=archived_at.isoformat()), 2)
+        self.assertEqual(count(archived_at__lt=archived_at.isoformat()), 0)
+
+
+class TestCarsInfoCheckApi(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def _get_concurrently(self, info_api, manufacturer, callers):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    info_api.get_manufacturer_models(manufacturer)
+                )
+            )
+            for _ in range(callers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @staticmethod
+    def _slow_fetch(manufacturer):
+        time.sleep(0.05)
+        return [f"{manufacturer} model"]
+
+    def test_concurrent_lookups_of_same_manufacturer_make_single_request(self):
+        info_api = CarsInfoCheckApi()
+
+        with patch.object(
+            info_api, "_fetch_manufacturer_models", side_effect=self._slow_fetch
+        ) as fetch_mock:
+            results = self._get_concurrently(info_api, "Volkswagen", callers=10)
+
+        self.assertEqual(fetch_mock.call_count, 1)
+        self.assertEqual(results, [["Volkswagen model"]] * 10)
+
+    def test_models_are_cached_per_manufacturer(self):
+        info_api = CarsInfoCheckApi()
+
+        with patch.object(
+            info_api, "_fetch_manufacturer_models", side_effect=self._slow_fetch
+        ) as fetch_mock:
+            self.assertEqual(info_api.get_manufacturer_models("Audi"), ["Audi model"])
+            self.assertEqual(info_api.get_manufacturer_models("Opel"), ["Opel model"])
+            self.assertEqual(info_api.get_manufacturer_models("Audi"), ["Audi model"])
+
+        self.assertEqual(fetch_mock.call_count, 2)
+
+    def test_failed_lookup_is_not_cached(self):
+        info_api = CarsInfoCheckApi()
+
+        with patch.object(
+            info_api, "_fetch_manufacturer_models", side_effect=[None, ["Golf"]]
+        ):
+            self.assertIsNone(info_api.get_manufacturer_models("Volkswagen"))
+            self.assertEqual(info_api.get_manufacturer_models("Volkswagen"), ["Golf"])
+
+    def test_lookups_are_shared_between_instances_with_lock_dir(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            info_api = CarsInfoCheckApi(lock_dir=lock_dir)
+            other_process_info_api = CarsInfoCheckApi(lock_dir=lock_dir)
+
+            with patch.object(
+                info_api, "_fetch_manufacturer_models", side_effect=self._slow_fetch
+            ), patch.object(
+                other_process_info_api, "_fetch_manufacturer_models"
+            ) as other_fetch_mock:
+                info_api.get_manufacturer_models("Skoda")
+                result = other_process_info_api.get_manufacturer_models("Skoda")
+
+        other_fetch_mock.assert_not_called()
+        self.assertEqual(result, ["Skoda model"])
+
+
+class TestWarmCatalogCommand(TestCase):
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_models_of_existing_and_configured_manufacturers_are_preloaded(
+        self, get_models
+    ):
+        get_models.return_value = ["a"]
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+        Car.objects.create(**EXAMPLE_CAR_DATA2)
+        out = StringIO()
+
+        with self.settings(CARS_CATALOG_MANUFACTURERS=["Volkswagen"]):
+            call_command("warm_catalog", "--workers", "2", stdout=out)
+
+        self.assertCountEqual(
+            [call.args[0] for call in get_models.call_args_list], ["b", "Volkswagen"]
+        )
+        self.assertIn("[2/2]", out.getvalue())
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_failed_lookups_are_reported(self, get_models):
+        get_models.return_value = None
+
+        with self.assertRaisesMessage(CommandError, "Lookup failed for: Volkswagen."):
+            call_command("warm_catalog", "Volkswagen", stdout=StringIO())
+
+
+class TestImportCarsCommand(TestCase):
+    CSV_HEADER = (
+        "registration_number,max_passengers,year_of_manufacture,model,manufacturer,"
+        "category,motor_type\n"
+    )
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def _read_rejects(self, path):
+        with open(f"{path}.rejects") as file:
+            return [json.loads(line) for line in file]
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_valid_rows_are_imported_and_invalid_rejected(self, get_models):
+        get_models.return_value = ["Golf", "Passat"]
+        path = self._write(
+            "cars.csv",
+            self.CSV_HEADER
+            + "KNS-1,4,2000,Golf,Volkswagen,economy,electric\n"
+            + "KNS-2,100,2000,Golf,Volkswagen,economy,electric\n"
+            + "KNS-3,4,2000,126p,Volkswagen,economy,electric\n"
+            + "KNS-1,4,2000,Passat,Volkswagen,economy,hybrid\n"
+            + "KNS-4,4,2001,Passat,Volkswagen,business,hybrid\n",
+        )
+
+        call_command("import_cars", path, "--chunk-size", "2", stdout=StringIO())
+
+        self.assertCountEqual(
+            Car.objects.values_list("registration_number", flat=True),
+            ["KNS-1", "KNS-4"],
+        )
+        rejects = self._read_rejects(path)
+        self.assertEqual([reject["row"] for reject in rejects], [2, 3, 4])
+        self.assertIn("max_passengers", rejects[0]["errors"])
+        self.assertIn("registration_number", rejects[2]["errors"])
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_import_is_resumed_from_checkpoint(self, get_models):
+        get_models.return_value = ["Golf"]
+        path = self._write(
+            "cars.ndjson",
+            "\n".join(
+                json.dumps({**EXAMPLE_CAR_DATA, "registration_number": f"KNS-{i}"})
+                for i in range(5)
+            )
+            .replace('"a"', '"Golf"')
+            .replace('"first class"', '"electric"'),
+        )
+
+        def crash_on_second_checkpoint(checkpoint_path, checkpoint):
+            if checkpoint["rows"] > 2:
+                raise KeyboardInterrupt
+            save_checkpoint(checkpoint_path, checkpoint)
+
+        with patch(
+            "cars_app.management.commands.import_cars.save_checkpoint",
+            side_effect=crash_on_second_checkpoint,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "import_cars", path, "--chunk-size", "2", stdout=StringIO()
+                )
+
+        # The second chunk was saved, but its checkpoint was not.
+        self.assertEqual(Car.objects.count(), 4)
+
+        out = StringIO()
+        call_command("import_cars", path, "--chunk-size", "2", stdout=out)
+
+        # Rows of the second chunk are identical to the saved cars, so they are
+        # counted as imported, not rejected as duplicates.
+        self.assertEqual(Car.objects.count(), 5)
+        self.assertEqual(self._read_rejects(path), [])
+        self.assertIn("Imported 5 cars, rejected 0 rows.", out.getvalue())
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_rows_of_earlier_import_are_rejected_as_duplicates(self, get_models):
+        get_models.return_value = ["Golf"]
+        path = self._write(
+            "cars.csv",
+            self.CSV_HEADER
+            + "KNS-1,4,2000,Golf,Volkswagen,economy,electric\n"
+            + "KNS-2,4,2000,Golf,Volkswagen,economy,electric\n",
+        )
+        call_command("import_cars", path, stdout=StringIO())
+
+        out = StringIO()
+        call_command("import_cars", path, "--restart", stdout=out)
+
+        self.assertEqual(Car.objects.count(), 2)
+        self.assertEqual([reject["row"] for reject in self._read_rejects(path)], [1, 2])
+        self.assertIn("Imported 0 cars, rejected 2 rows.", out.getvalue())
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_rows_can_be_validated_by_multiple_processes(self, get_models):
+        get_models.return_value = ["Golf"]
+        path = self._write(
+            "cars.csv",
+            self.CSV_HEADER
+            + "".join(
+                f"KNS-{i},4,2000,Golf,Volkswagen,economy,electric\n" for i in range(10)
+            ),
+        )
+
+        call_command(
+            "import_cars",
+            path,
+            "--chunk-size",
+            "3",
+            "--workers",
+            "2",
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Car.objects.count(), 10)
+
+
+class _InProcessExecutor:
+    """Executor running tasks immediately, so they can use the test database.
+
+    Tasks are pickled like by a process pool, which must not query the database
+    (as pickling of querysets does).
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @staticmethod
+    def submit(fn, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            fn, args, kwargs = pickle.loads(pickle.dumps((fn, args, kwargs)))
+        if queries:
+            raise AssertionError(f"Pickling of task queried database: {queries[0]}")
+
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class TestArchiveCarsCommand(TestCase):
+    def test_matching_cars_are_archived_in_batches(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        Car.objects.create(**EXAMPLE_CAR_DATA2)
+        Car.objects.create(**EXAMPLE_CAR_DATA3)
+        stdout = StringIO()
+
+        call_command(
+            "archive_cars",
+            "--filter=year_of_manufacture__gte=2001",
+            "--batch-size=1",
+            stdout=stdout,
+        )
+
+        self.assertIn("Archived 2 cars.", stdout.getvalue())
+        self.assertEqual(list(Car.objects.values_list("id", flat=True)), [car.pk])
+        self.assertEqual(
+            sorted(ArchivedCar.objects.values_list("registration_number", flat=True)),
+            ["GHJK-123", "xxxx-123"],
+        )
+
+    def test_filters_are_required(self):
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        with self.assertRaises(CommandError):
+            call_command("archive_cars")
+        with self.assertRaises(CommandError):
+            call_command("archive_cars", "--filter=max_passengers=many")
+        self.assertEqual(Car.objects.count(), 1)
+
+
+class TestGenerateFleetCommand(TestCase):
+    def test_generated_cars_are_valid_and_unique(self):
+        call_command("generate_fleet", "50", "--batch-size=20", stdout=StringIO())
+        call_command("generate_fleet", "50", "--seed=1", stdout=StringIO())
+
+        cars = list(Car.objects.all())
+        self.assertEqual(len(cars), 100)
+        self.assertEqual(len({car.registration_number for car in cars}), 100)
+        for car in cars:
+            car.full_clean()
+            self.assertIn(car.model, STUB_CATALOG[car.manufacturer])
+
+
+class TestExportCarsCommand(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cars = [
+            Car.objects.create(**EXAMPLE_CAR_DATA),
+            Car.objects.create(**EXAMPLE_CAR_DATA2),
+            Car.objects.create(**EXAMPLE_CAR_DATA3),
+        ]
+
+    def _export(self, name, *args):
+        path = os.path.join(self.tmp_dir.name, name)
+        call_command("export_cars", path, "--chunk-size", "2", *args, stdout=StringIO())
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_cars_are_exported_to_csv(self):
+        content = self._export("cars.csv")
+
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual(
+            rows,
+            [
+                {key: str(value) for key, value in model_to_dict(car).items()}
+                for car in self.cars
+            ],
+        )
+
+    def test_cars_are_exported_to_ndjson_with_filters(self):
+        content = self._export(
+            "cars.ndjson", "--filter", "year_of_manufacture__gt=2000"
+        )
+
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows, [model_to_dict(car) for car in self.cars[1:]])
+
+    def test_cars_are_exported_to_columnar_format(self):
+        content = self._export("cars.columnar")
+
+        schema, columns = read_columnar(content)
+        self.assertIn({"name": "category", "type": "dictionary"}, schema["columns"])
+        self.assertEqual(
+            columns["registration_number"],
+            [car.registration_number for car in self.cars],
+        )
+        self.assertEqual(list(columns["max_passengers"]), [5, 5, 6])
+        self.assertEqual(columns["category"], ["economy"] * 3)
+
+    @patch("cars_app.management.commands.export_cars.ProcessPoolExecutor")
+    def test_id_ranges_of_workers_are_exported_in_order(self, executor_mock):
+        executor_mock.side_effect = _InProcessExecutor
+
+        content = self._export("cars.ndjson", "--workers", "2")
+
+        self.assertEqual(executor_mock.call_args.args[0], 2)
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows, [model_to_dict(car) for car in self.cars])
+
+    @patch("cars_app.management.commands.export_cars.ProcessPoolExecutor")
+    def test_workers_get_filters_instead_of_queryset(self, executor_mock):
+        executor_mock.side_effect = _InProcessExecutor
+
+        content = self._export(
+            "cars.ndjson", "--workers", "2", "--filter", "max_passengers=5"
+        )
+
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows, [model_to_dict(car) for car in self.cars[:2]])
+
+    def test_invalid_filters_are_rejected(self):
+        with self.assertRaises(CommandError):
+            self._export("cars.csv", "--filter", "max_passengers__gt=many")
+
+
+class TestWriteAdmissionControl(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_writes_above_client_rate_are_throttled(self):
+        cars = [
+            Car.objects.create(**EXAMPLE_CAR_DATA),
+            Car.objects.create(**EXAMPLE_CAR_DATA2),
+            Car.objects.create(**EXAMPLE_CAR_DATA3),
+        ]
+        throttle_rates = {"car_add": None, "car_update": None, "car_delete": "2/min"}
+
+        with self.settings(REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": throttle_rates}):
+            responses = [
+                self.client.post("/car:delete", data={"pk": car.pk}) for car in cars
+            ]
+
+        self.assertEqual([r.status_code for r in responses], [204, 204, 429])
+        self.assertEqual(responses[2]["Retry-After"], "30")
+        self.assertEqual(Car.objects.count(), 1)
+
+    def test_concurrent_writes_of_client_take_tokens_one_by_one(self):
+        request = RequestFactory().post("/car:delete")
+        get = LocMemCache.get
+
+        def slow_get(*args, **kwargs):
+            # Widens the window between reading of the bucket and writing of it.
+            value = get(*args, **kwargs)
+            time.sleep(0.01)
+            return value
+
+        def allow_request():
+            barrier.wait()
+            allowed.append(DeleteCarRateThrottle().allow_request(request, None))
+
+        barrier = threading.Barrier(6)
+        allowed = []
+        threads = [threading.Thread(target=allow_request) for _ in range(6)]
+        throttle_rates = {"car_add": None, "car_update": None, "car_delete": "3/min"}
+
+        with self.settings(REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": throttle_rates}):
+            with patch.object(LocMemCache, "get", slow_get):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        self.assertEqual(allowed.count(True), 3)
+
+    def test_writes_above_concurrency_limit_are_rejected(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        with self.settings(CARS_MAX_CONCURRENT_WRITES=1, CARS_WRITE_RETRY_AFTER=3):
+            write_slots = _get_write_slots(1)
+            write_slots.acquire()
+            try:
+                response = self.client.post("/car:delete", data={"pk": car.pk})
+            finally:
+                write_slots.release()
+            response2 = self.client.post("/car:delete", data={"pk": car.pk})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(response2.status_code, 204)
+
+
+class TestIdempotencyKeys(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.car_data = {**EXAMPLE_CAR_DATA, "motor_type": "electric"}
+
+    def _add_car(self, data, key, address="127.0.0.1"):
+        return self.client.post(
+            "/car:add",
+            data=data,
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            REMOTE_ADDR=address,
+        )
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_retried_add_is_replayed_without_validation(self, get_models):
+        get_models.return_value = ["a"]
+
+        response = self._add_car(self.car_data, key="key-1")
+        with self.assertNumQueries(0):
+            response2 = self._add_car(self.car_data, key="key-1")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response2.status_code, 201)
+        self.assertEqual(response2.json(), response.json())
+        self.assertEqual(response2["Idempotent-Replayed"], "true")
+        self.assertEqual(get_models.call_count, 1)
+        self.assertEqual(Car.objects.count(), 1)
+
+        # Another key is another request.
+        response3 = self._add_car(self.car_data, key="key-2")
+        self.assertEqual(response3.status_code, 400)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_key_cant_be_reused_for_different_request(self, get_models):
+        get_models.return_value = ["a"]
+
+        self._add_car(self.car_data, key="key-1")
+        response = self._add_car(
+            {**self.car_data, "registration_number": "other-1"}, key="key-1"
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Car.objects.count(), 1)
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_same_key_of_different_clients_is_not_shared(self, get_models):
+        get_models.return_value = ["a"]
+        other_car_data = {**self.car_data, "registration_number": "other-1"}
+
+        response = self._add_car(self.car_data, key="key-1", address="10.0.0.1")
+        response2 = self._add_car(other_car_data, key="key-1", address="10.0.0.2")
+
+        self.assertEqual([response.status_code, response2.status_code], [201, 201])
+        self.assertFalse(response2.has_header("Idempotent-Replayed"))
+        self.assertEqual(response2.json()["registration_number"], "other-1")
+        self.assertEqual(Car.objects.count(), 2)
+
+    def test_retried_update_is_replayed(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        data = {"pk": car.pk, "max_passengers": 7}
+
+        responses = [
+            self.client.post(
+                "/car:update",
+                data=data,
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="key-1",
+                HTTP_IF_MATCH='"1"',
+            )
+            for _ in range(2)
+        ]
+
+        self.assertEqual([r.status_code for r in responses], [204, 204])
+        self.assertEqual(responses[1]["ETag"], '"2"')
+        car.refresh_from_db()
+        self.assertEqual(car.version, 2)
+
+    @override_settings(CARS_IDEMPOTENCY_IN_PROGRESS_TTL=0.05)
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_key_of_killed_request_is_released_after_request_timeout(self, get_models):
+        # Worker killed on timeout, which isn't handled as an error of the view.
+        get_models.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self._add_car(self.car_data, key="key-1")
+        get_models.side_effect = None
+        get_models.return_value = ["a"]
+
+        response = self._add_car(self.car_data, key="key-1")
+        time.sleep(0.1)
+        response2 = self._add_car(self.car_data, key="key-1")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response2.status_code, 201)
+        self.assertEqual(Car.objects.count(), 1)
+
+    def test_retry_of_request_in_progress_is_rejected(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        # Key taken by a request which hasn't finished yet.
+        cache.add(
+            "cars_app:idempotency:update_car:127.0.0.1:key-1", ("fingerprint", None)
+        )
+
+        response = self.client.post(
+            "/car:update",
+            data={"pk": car.pk, "max_passengers": 7},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="key-1",
+        )
+
+        self.assertEqual(response.status_code, 409)
+        car.refresh_from_db()
+        self.assertEqual(car.max_passengers, 5)
+
+
+class TestBatchView(TestCase):
+    def setUp(self) -> None:
+        self.url = "/car:batch"
+        self.car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        self.car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+
+    def _run_batch(self, *operations):
+        return self.client.post(
+            self.url, data={"operations": operations}, content_type="application/json"
+        )
+
+    def test_operations_are_run_in_single_request(self):
+        response = self._run_batch(
+            {"operation": "retrieve", "params": {"id": self.car.pk}},
+            {"operation": "update", "data": {"pk": self.car.pk, "max_passengers": 4}},
+            {"operation": "delete", "data": {"pk": self.car2.pk}},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertTrue(content["committed"])
+        self.assertEqual(
+            [result["status"] for result in content["results"]], [200, 204, 204]
+        )
+        self.assertEqual(content["results"][0]["data"]["id"], self.car.pk)
+        self.assertEqual(content["results"][0]["etag"], '"1"')
+        self.assertEqual(Car.objects.get().max_passengers, 4)
+
+    def test_changes_are_rolled_back_when_operation_fails(self):
+        response = self._run_batch(
+            {"operation": "delete", "data": {"pk": self.car2.pk}},
+            {"operation": "update", "data": {"pk": self.car.pk, "max_passengers": 0}},
+            {"operation": "delete", "data": {"pk": self.car.pk}},
+        )
+
+        self.assertEqual(response.status_code, 422)
+        content = response.json()
+        self.assertFalse(content["committed"])
+        self.assertEqual(
+            [result["status"] for result in content["results"]], [204, 422]
+        )
+        self.assertEqual(Car.objects.count(), 2)
+
+    def test_invalid_operations_are_rejected(self):
+        self.assertEqual(self._run_batch().status_code, 400)
+        self.assertEqual(self._run_batch({"operation": "truncate"}).status_code, 400)
+
+        with override_settings(CARS_BATCH_MAX_OPERATIONS=1):
+            response = self._run_batch(
+                {"operation": "retrieve", "params": {"id": self.car.pk}},
+                {"operation": "retrieve", "params": {"id": self.car2.pk}},
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CARS_LIST_SNAPSHOT=True)
+class TestCarsListSnapshot(TransactionTestCase):
+    # Snapshot is refreshed after commit, so changes can't be made in a test
+    # transaction.
+
+    def setUp(self) -> None:
+        self.url = "/car:list"
+        fleet_snapshot.clear()
+        self.addCleanup(fleet_snapshot.clear)
+        self.car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        self.car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+        self.car3 = Car.objects.create(**EXAMPLE_CAR_DATA3)
+
+    def _get_pks(self, **params):
+        return [car["pk"] for car in self.client.get(self.url, data=params).json()]
+
+    def test_supported_filters_are_answered_without_queries(self):
+        self.assertEqual(self._get_pks(), [self.car.pk, self.car2.pk, self.car3.pk])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url,
+                data={
+                    "manufacturer": "b",
+                    "max_passengers": 5,
+                    "year_of_manufacture__gt": 2000,
+                    "show_category": True,
+                },
+            )
+
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "model": "cars_app.car",
+                    "pk": self.car2.pk,
+                    "fields": model_to_dict(self.car2, exclude=["motor_type", "id"]),
+                }
+            ],
+        )
+
+    def test_unsupported_filters_are_answered_from_database(self):
+        self._get_pks()
+
+        with self.assertNumQueries(1):
+            pks = self._get_pks(registration_number__icontains="xxx")
+
+        self.assertEqual(pks, [self.car3.pk])
+
+    def test_snapshot_is_refreshed_after_changes(self):
+        self._get_pks()
+
+        self.client.post(
+            "/car:update",
+            data={"pk": self.car.pk, "year_of_manufacture": 2010},
+            content_type="application/json",
+        )
+        self.client.post("/car:delete", data={"pk": self.car3.pk})
+        car4 = Car.objects.create(
+            **{**EXAMPLE_CAR_DATA, "registration_number": "new-1"}
+        )
+
+        self.assertEqual(
+            self._get_pks(year_of_manufacture__gt=2000), [self.car.pk, self.car2.pk]
+        )
+        self.assertEqual(self._get_pks(year_of_manufacture__lt=2001), [car4.pk])
+
+    def test_indexes_are_updated_with_changed_cars(self):
+        self._get_pks()
+        self.client.post(
+            "/car:update",
+            data={"pk": self.car2.pk, "year_of_manufacture": 2010, "max_passengers": 7},
+            content_type="application/json",
+        )
+        self.client.post("/car:delete", data={"pk": self.car3.pk})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self._get_pks(manufacturer="b"), [self.car.pk, self.car2.pk]
+            )
+            self.assertEqual(self._get_pks(year_of_manufacture=2010), [self.car2.pk])
+            self.assertEqual(self._get_pks(max_passengers__gt=5), [self.car2.pk])
+            self.assertEqual(self._get_pks(max_passengers=6), [])
+
+    def test_ranges_and_lists_of_values_are_answered_from_snapshot(self):
+        self._get_pks()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self._get_pks(
+                    max_passengers__in="5,6", year_of_manufacture__range="2001,2002"
+                ),
+                [self.car2.pk, self.car3.pk],
+            )
+            self.assertEqual(
+                self._get_pks(year_of_manufacture__lte=2001, category="economy"),
+                [self.car.pk, self.car2.pk],
+            )
+            self.assertEqual(self._get_pks(manufacturer__in="x,y"), [])
+
+    def test_top_cars_are_answered_from_snapshot(self):
+        car4 = Car.objects.create(**{**EXAMPLE_CAR_DATA, "registration_number": "a-1"})
+        self._get_pks()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self._get_pks(ordering="-year_of_manufacture", limit=3),
+                [self.car3.pk, self.car2.pk, car4.pk],
+            )
+            self.assertEqual(
+                self._get_pks(ordering="max_passengers", limit=2, manufacturer="b"),
+                [self.car.pk, self.car2.pk],
+            )
+            self.assertEqual(
+                self._get_pks(ordering="registration_number", limit=2),
+                [self.car2.pk, car4.pk],
+            )
+            self.assertEqual(self._get_pks(ordering="-id", limit=1), [car4.pk])
+
+    def test_cars_are_counted_in_snapshot(self):
+        self._get_pks()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, data={"count": True, "max_passengers": 5}
+            )
+            self.assertEqual(response.json(), {"count": 2, "approximate": False})
+            response = self.client.get(
+                self.url, data={"exists": True, "manufacturer": "x"}
+            )
+            self.assertEqual(response.json(), {"exists": False})
+
+    def test_bitmap_positions(self):
+        bitmap = 1 | 1 << 7 | 1 << 8 | 1 << 1000
+        self.assertEqual(get_bitmap_positions(bitmap, 1001), [0, 7, 8, 1000])
+        self.assertEqual(get_bitmap_positions(0, 1001), [])
+
+    def test_indexed_column_updates_only_bits_of_changed_rows(self):
+        column = _IndexedColumn.from_values(["a", "b", "a"])
+        column.append("c")
+        column[0] = "b"
+        column[1] = "b"
+        column.clear(2)
+
+        self.assertEqual(column.values, ["a", "b", "c"])
+        self.assertEqual(column.bitmaps, [0, 0b0011, 0b1000])
+        self.assertEqual(column.get_values([0, 1, 3]), ["b", "b", "c"])
+
+    def test_indexed_column_has_more_than_256_values(self):
+        values = [f"m{i}" for i in range(300)]
+        appended = _IndexedColumn()
+        for value in values:
+            appended.append(value)
+        built = _IndexedColumn.from_values(values)
+
+        for column in [appended, built]:
+            self.assertEqual(
+                column.get_values([0, 255, 256, 299]), ["m0", "m255", "m256", "m299"]
+            )
+            self.assertEqual(column.bitmaps[299], 1 << 299)
+
+    def test_snapshot_has_more_than_256_manufacturers(self):
+        Car.objects.bulk_create(
+            Car(
+                **{
+                    **EXAMPLE_CAR_DATA,
+                    "registration_number": f"m-{i}",
+                    "manufacturer": f"m{i}",
+                }
+            )
+            for i in range(300)
+        )
+        car = Car.objects.get(manufacturer="m299")
+        self._get_pks()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get_pks(manufacturer="m299"), [car.pk])
+
+    def test_outdated_snapshot_is_reloaded(self):
+        self._get_pks()
+        # Changes of other processes are not signalled.
+        Car.objects.filter(pk=self.car.pk).update(max_passengers=10)
+
+        self.assertEqual(self._get_pks(max_passengers__gt=5), [self.car3.pk])
+        with self.settings(CARS_LIST_SNAPSHOT_MAX_AGE=0):
+            self.assertEqual(
+                self._get_pks(max_passengers__gt=5), [self.car.pk, self.car3.pk]
+            )
+
+
+@override_settings(CARS_EVENTS=True, CARS_EVENTS_POLL_INTERVAL=0.01)
+class TestCarEvents(TransactionTestCase):
+    # Events are read by the stream in another thread, so they have to be committed.
+
+    def _get_events(self):
+        return list(CarEvent.objects.order_by("id").values_list("type", "car_id"))
+
+    def _stream(self, params="", last_event_id=None, events=1, while_streaming=None):
+        """Get ids and types of the events sent by car:events, disconnecting after the
+        given number of them."""
+
+        headers = []
+        if last_event_id is not None:
+            headers.append((b"last-event-id", str(last_event_id).encode()))
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/car:events",
+            "query_string": params.encode(),
+            "headers": headers,
+        }
+        messages = []
+
+        async def run():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                body = message.get("body", b"")
+                if body == b": connected\n\n" and while_streaming:
+                    await sync_to_async(while_streaming)()
+                if sum(m.get("body", b"").count(b"id: ") for m in messages) >= events:
+                    disconnected.set()
+
+            application = CarEventsApplication(django_application=None)
+            await asyncio.wait_for(application(scope, receive, send), timeout=10)
+
+        asyncio.run(run())
+        self.assertEqual(messages[0]["status"], 200)
+        body = b"".join(m.get("body", b"") for m in messages[1:]).decode()
+        return [
+            (int(lines[0][4:]), lines[1][7:], json.loads(lines[2][6:])["pk"])
+            for lines in (message.split("\n") for message in body.split("\n\n"))
+            if lines[0].startswith("id: ")
+        ]
+
+    @patch("cars_app.views.info_api.get_manufacturer_models")
+    def test_changes_of_cars_are_recorded_as_events(self, get_models):
+        get_models.return_value = ["a"]
+        self.client.post(
+            "/car:add",
+            data={**EXAMPLE_CAR_DATA, "motor_type": "electric"},
+            content_type="application/json",
+        )
+        pk = Car.objects.get().pk
+        self.client.post(
+            "/car:update",
+            data={"pk": pk, "max_passengers": 4},
+            content_type="application/json",
+        )
+        self.client.post("/car:delete", data={"pk": pk})
+
+        self.assertEqual(
+            self._get_events(), [("created", pk), ("updated", pk), ("deleted", pk)]
+        )
+        self.assertEqual(CarEvent.objects.get(type="updated").max_passengers, 4)
+
+    @override_settings(CARS_EVENTS=False)
+    def test_no_events_are_recorded_when_disabled(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car.delete()
+
+        self.assertEqual(self._get_events(), [])
+
+    def test_events_are_matched_against_filters(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        Car.objects.create(**EXAMPLE_CAR_DATA3)
+        event, event3 = CarEvent.objects.order_by("id")
+
+        matches = get_event_matcher(
+            QueryDict("max_passengers__lte=5&plate=ASDF123&manufacturer__in=b,c")
+        )
+
+        self.assertEqual((matches(event), matches(event3)), (True, False))
+        self.assertEqual(event.car_id, car.pk)
+        with self.assertRaises(ValueError):
+            get_event_matcher(QueryDict("max_passengers=many"))
+
+    def test_stream_is_resumed_after_last_received_event(self):
+        car = Car.objects.create(**EXAMPLE_CAR_DATA)
+        car2 = Car.objects.create(**EXAMPLE_CAR_DATA2)
+        last_event_id = CarEvent.objects.get(car_id=car.pk).id
+
+        def add_car():
+            Car.objects.create(**EXAMPLE_CAR_DATA3)
+
+        events = self._stream(
+            last_event_id=last_event_id, events=2, while_streaming=add_car
+        )
+
+        car3 = Car.objects.get(registration_number="xxxx-123")
+        self.assertEqual(
+            events,
+            [
+                (last_event_id + 1, "created", car2.pk),
+                (last_event_id + 2, "created", car3.pk),
+            ],
+        )
+
+    def test_stream_is_scoped_to_filtered_cars(self):
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+
+        def change_cars():
+            Car.objects.create(**EXAMPLE_CAR_DATA2)
+            Car.objects.create(**EXAMPLE_CAR_DATA3).delete()
+
+        events = self._stream(
+            params="max_passengers=6", events=2, while_streaming=change_cars
+        )
+
+        self.assertEqual([type_ for _, type_, _ in events], ["created", "deleted"])
+
+    def test_stream_with_invalid_filters_is_rejected(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        application = CarEventsApplication(django_application=None)
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/car:events",
+            "query_string": b"max_passengers=many",
+            "headers": [],
+        }
+        asyncio.run(application(scope, None, send))
+
+        self.assertEqual(messages[0]["status"], 400)
+
+
+@override_settings(CARS_PROFILING_TOKEN="secret")
+class TestRequestProfiling(TestCase):
+    def setUp(self) -> None:
+        Car.objects.create(**EXAMPLE_CAR_DATA)
+
+    def test_request_of_authorized_client_is_profiled(self):
+        response = self.client.get("/car:list", HTTP_X_PROFILE="secret")
+
+        self.assertEqual(response["Content-Type"], "application/octet-stream")
+        self.assertEqual(response["X-Profiled-Status"], "200")
+        stats = marshal.loads(response.content)
+        self.assertIn("get_cars_list", {function for _, _, function in stats})
+
+    def test_staff_user_can_profile_without_token(self):
+        user = User.objects.create(username="admin", is_staff=True)
+        self.client.force_login(user)
+
+        response = self.client.get("/car:list", HTTP_X_PROFILE="1")
+
+        self.assertEqual(response["X-Profiled-Status"], "200")
+
+    def test_request_with_invalid_token_is_not_profiled(self):
+        response = self.client.get("/car:list", HTTP_X_PROFILE="guess")
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(len(response.json()), 1)
+
+    def test_sampled_stacks_are_exported_to_authorized_clients(self):
+        sampler = StackSampler()
+        with sampler.track_current_thread():
+            sampler.sample()
+            sampler.sample()
+        sampler.sample()
+
+        [line] = sampler.export().splitlines()
+        self.assertTrue(
+            line.endswith(
+                "cars_app.tests:test_sampled_stacks_are_exported_to_authorized_clients"
+                ";cars_app.profiling:sample 2"
+            )
+        )
+        self.assertEqual(sampler.export(), "")
+
+        response = self.client.get("/profiling:samples")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/profiling:samples", HTTP_X_PROFILE="secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain")
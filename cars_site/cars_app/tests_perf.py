@@ -0,0 +1,136 @@
+"""Performance tests of the cars endpoints on a large generated fleet.
+
+They are skipped unless the size of the fleet is set, e.g.:
+
+    CARS_PERF_FLEET_SIZE=1000000 python manage.py test cars_app.tests_perf
+
+Every endpoint has a budget of queries and of the best time of a few requests, in
+milliseconds. The times can be scaled for slower machines with CARS_PERF_BUDGET_SCALE.
+"""
+
+import itertools
+import os
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .fleet import create_fleet, get_stub_models
+from .models import Car
+
+FLEET_SIZE = int(os.environ.get("CARS_PERF_FLEET_SIZE") or 0)
+BUDGET_SCALE = float(os.environ.get("CARS_PERF_BUDGET_SCALE") or 1)
+REPEATS = 5
+
+# The rate limits of the writes are not measured.
+NO_THROTTLING = {
+    **settings.REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {
+        scope: None for scope in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+    },
+}
+
+
+@skipUnless(FLEET_SIZE, "Set CARS_PERF_FLEET_SIZE to run the performance tests.")
+@override_settings(REST_FRAMEWORK=NO_THROTTLING, CARS_LIST_SNAPSHOT=False)
+@patch("cars_app.views.info_api.get_manufacturer_models", get_stub_models)
+class TestCarsEndpointsAtScale(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_fleet(FLEET_SIZE)
+        cls.car = Car.objects.order_by("id")[FLEET_SIZE // 2]
+
+    def assertWithinBudget(self, send_request, queries, milliseconds):
+        """Check the number of queries of the request and the best time of it out of
+        a few repeats."""
+
+        with self.assertNumQueries(queries):
+            response = send_request()
+        self.assertLess(response.status_code, 400, response.content)
+
+        best = float("inf")
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            send_request()
+            best = min(best, (time.perf_counter() - started) * 1000)
+
+        budget = milliseconds * BUDGET_SCALE
+        self.assertLessEqual(
+            best, budget, f"{best:.1f} ms is over budget of {budget:.1f} ms."
+        )
+
+    def _list(self, **params):
+        return lambda: self.client.get("/car:list", data=params)
+
+    def test_car_is_retrieved_by_id(self):
+        self.assertWithinBudget(
+            lambda: self.client.get("/car:retrieve", data={"id": self.car.pk}),
+            queries=1,
+            milliseconds=5,
+        )
+
+    def test_car_is_found_by_plate(self):
+        plate = self.car.registration_number.lower().replace("-", " ")
+        self.assertWithinBudget(self._list(plate=plate), queries=1, milliseconds=10)
+
+    def test_newest_cars_are_listed_from_index(self):
+        self.assertWithinBudget(
+            self._list(ordering="-year_of_manufacture", limit=100, format="compact"),
+            queries=1,
+            milliseconds=10,
+        )
+
+    def test_first_cars_of_manufacturer_are_listed(self):
+        self.assertWithinBudget(
+            self._list(manufacturer="Kia", limit=100, format="compact"),
+            queries=1,
+            milliseconds=10,
+        )
+
+    def test_existence_of_filtered_cars_is_checked(self):
+        self.assertWithinBudget(
+            self._list(manufacturer="Tesla", max_passengers=9, exists=True),
+            queries=1,
+            milliseconds=10,
+        )
+
+    def test_car_is_added(self):
+        numbers = itertools.count()
+        self.assertWithinBudget(
+            lambda: self.client.post(
+                "/car:add",
+                data={
+                    "registration_number": f"PERF-{next(numbers)}",
+                    "max_passengers": 5,
+                    "year_of_manufacture": 2020,
+                    "manufacturer": "Skoda",
+                    "model": "Octavia",
+                    "category": "economy",
+                    "motor_type": "hybrid",
+                },
+                content_type="application/json",
+            ),
+            queries=2,
+            milliseconds=10,
+        )
+
+    def test_car_is_updated(self):
+        self.assertWithinBudget(
+            lambda: self.client.post(
+                "/car:update",
+                data={"pk": self.car.pk, "max_passengers": 4},
+                content_type="application/json",
+            ),
+            queries=1,
+            milliseconds=10,
+        )
+
+    def test_car_is_deleted(self):
+        ids = iter(Car.objects.order_by("id").values_list("id", flat=True)[:10])
+        self.assertWithinBudget(
+            lambda: self.client.post("/car:delete", data={"pk": next(ids)}),
+            queries=2,
+            milliseconds=10,
+        )
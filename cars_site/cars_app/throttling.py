@@ -0,0 +1,140 @@
+import functools
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+def get_client_ident(request):
+    """Get identity of the client: its user, or its address if it's anonymous."""
+
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user-{user.pk}"
+    return BaseThrottle().get_ident(request)
+
+
+class TokenBucketRateThrottle(SimpleRateThrottle):
+    """Token bucket throttle per client and scope.
+
+    Rates are set in DEFAULT_THROTTLE_RATES of REST_FRAMEWORK setting, e.g. "60/min"
+    allows bursts of 60 requests and refills one token per second. A None rate turns
+    the throttle off. Buckets are kept in the cache, so with a cache shared by all
+    workers the limits are global, and updated under a lock in the cache.
+    """
+
+    # Seconds to wait for the lock of a bucket, and after which a lock left by a
+    # crashed worker expires.
+    lock_wait = 0.5
+    lock_retry_interval = 0.005
+    lock_timeout = 1
+
+    def get_rate(self):
+        # Read on each request instead of once per class, so changes of the setting
+        # are applied.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": get_client_ident(request),
+        }
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        lock_key = f"{self.key}:lock"
+        if not self._acquire_lock(lock_key):
+            # Other requests of the client hold its bucket, it can retry shortly.
+            self._wait = self.lock_timeout
+            return False
+
+        try:
+            return self._take_token()
+        finally:
+            self.cache.delete(lock_key)
+
+    def _acquire_lock(self, lock_key):
+        """Lock the bucket with `cache.add`, which is atomic, so that concurrent
+        requests of the client don't overwrite tokens taken by each other."""
+
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(lock_key, True, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.lock_retry_interval)
+        return True
+
+    def _take_token(self):
+        now = self.timer()
+        refill_rate = self.num_requests / self.duration
+
+        tokens, updated_at = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated_at) * refill_rate)
+
+        if tokens < 1:
+            self._wait = (1 - tokens) / refill_rate
+            return False
+
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class AddCarRateThrottle(TokenBucketRateThrottle):
+    scope = "car_add"
+
+
+class UpdateCarRateThrottle(TokenBucketRateThrottle):
+    scope = "car_update"
+
+
+class DeleteCarRateThrottle(TokenBucketRateThrottle):
+    scope = "car_delete"
+
+
+_write_slots = None
+_write_slots_lock = threading.Lock()
+
+
+def _get_write_slots(limit):
+    global _write_slots
+
+    with _write_slots_lock:
+        if _write_slots is None or _write_slots[0] != limit:
+            _write_slots = (limit, threading.BoundedSemaphore(limit))
+        return _write_slots[1]
+
+
+def limit_concurrent_writes(view):
+    """Reject the request with 429 status if the process handles too many writes.
+
+    The limit is set with CARS_MAX_CONCURRENT_WRITES setting (None means no limit)
+    and applies to all decorated views together.
+    """
+
+    @functools.wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        if settings.CARS_MAX_CONCURRENT_WRITES is None:
+            return view(request, *args, **kwargs)
+
+        write_slots = _get_write_slots(settings.CARS_MAX_CONCURRENT_WRITES)
+        if not write_slots.acquire(blocking=False):
+            raise Throttled(
+                wait=settings.CARS_WRITE_RETRY_AFTER,
+                detail="Too many concurrent writes, try again later.",
+            )
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            write_slots.release()
+
+    return wrapped_view
@@ -5,7 +5,10 @@ from . import views
 urlpatterns = [
     path("car:retrieve", views.get_car),
     path("car:list", views.get_cars_list),
+    path("car:archive", views.get_archived_cars_list),
     path("car:add", views.add_car),
     path("car:update", views.update_car),
     path("car:delete", views.delete_car),
+    path("car:batch", views.run_batch),
+    path("profiling:samples", views.get_profile_samples),
 ]
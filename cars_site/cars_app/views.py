@@ -1,23 +1,50 @@
 import json
 
+from django.conf import settings
 from django.core import serializers
 from django.core.serializers.json import DjangoJSONEncoder
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
-from .filters import CarFilter
+from . import columnar
+from .archiving import archive_cars
+from .batching import run_operation
+from .counting import count_cars
+from .events import atomic_with_events
+from .exporting import get_columnar_writer, iter_chunks
+from .filters import ArchivedCarFilter, CarFilter
+from .idempotency import idempotent
 from .models import Car
+from .profiling import is_profiling_allowed, profiling_exempt, stack_sampler
 from .serializers import (
+    BatchSerializer,
     CarsInfoCheckApi,
     CarUpdateSerializer,
     FlagSerializer,
     GeneralCarSerializer,
+    ListOptionsSerializer,
 )
+from .signals import cars_updated
+from .snapshot import fleet_snapshot
+from .throttling import (
+    AddCarRateThrottle,
+    DeleteCarRateThrottle,
+    UpdateCarRateThrottle,
+    limit_concurrent_writes,
+)
+
+# Fields of the Car model which are not a part of its representation.
+INTERNAL_FIELDS = ["version", "registration_key"]
 
-info_api = CarsInfoCheckApi()
+info_api = CarsInfoCheckApi(
+    lock_dir=settings.CARS_INFO_API_LOCK_DIR,
+    cache_timeout=settings.CARS_INFO_API_CACHE_TIMEOUT,
+)
 
 
 @api_view(["GET"])
@@ -32,31 +59,92 @@ def get_car(request):
             show_category, show_motor_type, car_fields=Car._meta.get_fields()
         )
         try:
-            [car] = Car.objects.filter(id=id_).values(*needed_fields)
+            [car] = Car.objects.filter(id=id_).values(*needed_fields, "version")
         except ValueError:
             return HttpResponse(status=422)
         else:
+            version = car.pop("version")
             car_serialized = json.dumps(car, cls=DjangoJSONEncoder)
-            return HttpResponse(car_serialized, content_type="application/json")
+            response = HttpResponse(car_serialized, content_type="application/json")
+            response["ETag"] = _get_etag(version)
+            return response
 
 
 @api_view(["GET"])
 def get_cars_list(request):
+    return _get_cars_list_response(request, CarFilter, fleet_snapshot)
+
+
+@api_view(["GET"])
+def get_archived_cars_list(request):
+    """List archived cars, with the same parameters as car:list and filters of the
+    time of archiving."""
+
+    return _get_cars_list_response(request, ArchivedCarFilter)
+
+
+def _get_cars_list_response(request, filter_class, snapshot=None):
+    """Get response with the cars list of the filter model, answered from the
+    snapshot if given and enabled."""
+
     try:
         show_category, show_type = _get_flags_from_params(request.GET)
+        list_options = _get_list_options_from_params(request.GET)
     except WrongParamsException:
         return HttpResponse(status=422)
     else:
+        model = filter_class._meta.model
+        list_format = list_options["format"]
+        limit = list_options.get("limit")
+        ordering = list_options.get("ordering", "id")
         needed_fields = _get_needed_fields(
-            show_category, show_type, car_fields=Car._meta.get_fields()
+            show_category, show_type, car_fields=model._meta.get_fields()
         )
-        qs = CarFilter(request.GET).qs
-        cars = qs.only(*needed_fields)
+        car_filter = filter_class(request.GET)
+        if not settings.CARS_LIST_SNAPSHOT:
+            snapshot = None
 
-        return HttpResponse(
-            serializers.serialize("json", cars, fields=needed_fields),
-            content_type="application/json",
-        )
+        if list_options["count"] or list_options["exists"]:
+            return _get_count_response(list_options, car_filter, snapshot)
+
+        if snapshot is not None and car_filter.is_valid():
+            rows = snapshot.filter(
+                car_filter.form.cleaned_data, needed_fields, ordering, limit
+            )
+            if rows is not None:
+                return _render_cars_rows(list_format, needed_fields, rows, model)
+
+        qs = car_filter.qs
+
+        if limit is not None:
+            # Top N cars are read with ORDER BY ... LIMIT from the index of the
+            # ordering field, with ties in the order of ids.
+            order_by = [ordering]
+            if ordering.lstrip("-") != "id":
+                order_by.append("-id" if ordering.startswith("-") else "id")
+            rows = list(qs.order_by(*order_by).values_list(*needed_fields)[:limit])
+            return _render_cars_rows(list_format, needed_fields, rows, model)
+
+        if list_format == "columnar":
+            return StreamingHttpResponse(
+                _stream_columnar(
+                    needed_fields,
+                    iter_chunks(qs, needed_fields, settings.CARS_LIST_CHUNK_SIZE),
+                    model,
+                ),
+                content_type=columnar.CONTENT_TYPE,
+            )
+        elif list_format == "compact":
+            # Column oriented layout, without keys repeated in every row.
+            content = json.dumps(
+                {"fields": needed_fields, "rows": list(qs.values_list(*needed_fields))},
+                cls=DjangoJSONEncoder,
+            )
+        else:
+            cars = qs.only(*needed_fields)
+            content = serializers.serialize("json", cars, fields=needed_fields)
+
+        return HttpResponse(content, content_type="application/json")
 
 
 def _get_flags_from_params(request_params):
@@ -76,10 +164,87 @@ def _get_flags_from_params(request_params):
     return show_category, show_motor_type
 
 
+def _get_count_response(list_options, car_filter, snapshot=None):
+    """Get response with number of the filtered cars, or whether there are any."""
+
+    count = None
+    if snapshot is not None and car_filter.is_valid():
+        count = snapshot.count(car_filter.form.cleaned_data)
+
+    if list_options["exists"]:
+        exists = car_filter.qs.exists() if count is None else count > 0
+        content = {"exists": exists}
+    else:
+        approximate = False
+        if count is None:
+            count, approximate = count_cars(
+                car_filter.qs, approximate=list_options["approximate"]
+            )
+        content = {"count": count, "approximate": approximate}
+
+    return HttpResponse(json.dumps(content), content_type="application/json")
+
+
+def _render_cars_rows(list_format, fields, rows, model=Car):
+    """Render response of the cars list from rows of `fields` values."""
+
+    if list_format == "columnar":
+        chunk_size = settings.CARS_LIST_CHUNK_SIZE
+        return StreamingHttpResponse(
+            _stream_columnar(
+                fields,
+                (rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)),
+                model,
+            ),
+            content_type=columnar.CONTENT_TYPE,
+        )
+    elif list_format == "compact":
+        content = {"fields": fields, "rows": rows}
+    else:
+        # The same layout as of Django serializers.
+        id_index = fields.index("id")
+        content = [
+            {
+                "model": model._meta.label_lower,
+                "pk": row[id_index],
+                "fields": {
+                    name: value for name, value in zip(fields, row) if name != "id"
+                },
+            }
+            for row in rows
+        ]
+
+    return HttpResponse(
+        json.dumps(content, cls=DjangoJSONEncoder), content_type="application/json"
+    )
+
+
+def _stream_columnar(fields, row_chunks, model=Car):
+    writer = get_columnar_writer(fields, model)
+
+    yield writer.header()
+    for rows in row_chunks:
+        yield writer.batch(rows)
+    yield writer.footer()
+
+
+def _get_list_options_from_params(request_params):
+    """Get options of the cars list from request parameters."""
+
+    serializer = ListOptionsSerializer(data=request_params)
+
+    if not serializer.is_valid():
+        raise WrongParamsException(f"Invalid list options: {serializer.errors}")
+
+    return serializer.validated_data
+
+
 def _get_needed_fields(show_category, show_type, car_fields):
     """Get list of fields that we need to fetch from the Car model."""
 
-    needed_fields = [field.name for field in car_fields]
+    needed_fields = [
+        field.name for field in car_fields if field.name not in INTERNAL_FIELDS
+    ]
 
     if show_category is False:
         needed_fields.remove("category")
@@ -90,44 +255,154 @@ def _get_needed_fields(show_category, show_type, car_fields):
 
 
 @api_view(["POST"])
+@throttle_classes([AddCarRateThrottle])
+@idempotent
+@limit_concurrent_writes
 def add_car(request):
     serializer = GeneralCarSerializer(info_api, data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        with atomic_with_events():
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(["POST"])
+@throttle_classes([UpdateCarRateThrottle])
+@idempotent
+@limit_concurrent_writes
 def update_car(request):
     data = JSONParser().parse(request)
     try:
-        id_ = data["pk"]
-        to_update = Car.objects.get(id=id_)
-    except (KeyError, ValueError, Car.DoesNotExist):
+        id_ = int(data["pk"])
+        expected_version = _get_expected_version(request, data)
+    except (KeyError, TypeError, ValueError, WrongParamsException):
         return HttpResponse(status=422)
     else:
-        serializer = CarUpdateSerializer(info_api, instance=to_update, data=data)
+        # The car is not fetched, its pk is enough to validate the sent fields.
+        serializer = CarUpdateSerializer(info_api, instance=Car(pk=id_), data=data)
         if serializer.is_valid():
-            serializer.update(
-                instance=to_update, validated_data=serializer.validated_data
-            )
-            return HttpResponse(status=204)
+            cars = Car.objects.filter(id=id_)
+            if expected_version is not None:
+                cars = cars.filter(version=expected_version)
+            try:
+                with atomic_with_events():
+                    updated = cars.update(
+                        **serializer.validated_data, version=F("version") + 1
+                    )
+                    if updated:
+                        cars_updated.send(sender=Car, ids=[id_])
+            except IntegrityError:
+                return HttpResponse(status=422)
+
+            if not updated:
+                # The car was changed or deleted since the version was read.
+                exists = Car.objects.filter(id=id_).exists()
+                return HttpResponse(status=409 if exists else 422)
+
+            response = HttpResponse(status=204)
+            if expected_version is not None:
+                response["ETag"] = _get_etag(expected_version + 1)
+            return response
         else:
             return HttpResponse(status=422)
 
 
+def _get_etag(version):
+    return f'"{version}"'
+
+
+def _get_expected_version(request, data):
+    """Get version of the car the client expects to update, or None if any."""
+
+    if "If-Match" in request.headers:
+        etag = request.headers["If-Match"].strip()
+        if etag == "*":
+            return None
+        version = etag[2:] if etag.startswith("W/") else etag
+        version = version.strip('"')
+    else:
+        version = data.get("version")
+
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise WrongParamsException("Version should be an integer.")
+
+
 @api_view(["POST"])
+@throttle_classes([DeleteCarRateThrottle])
+@limit_concurrent_writes
 def delete_car(request):
     try:
         id_ = request.data["pk"]
-        Car.objects.get(id=id_).delete()
+        if settings.CARS_ARCHIVE:
+            if not archive_cars(Car.objects.filter(id=id_)):
+                raise Car.DoesNotExist
+        else:
+            Car.objects.get(id=id_).delete()
     except (KeyError, ValueError, Car.DoesNotExist):
         return HttpResponse(status=422)
     else:
         return HttpResponse(status=204)
 
 
+# Methods and views of the operations of car:batch.
+BATCH_OPERATIONS = {
+    "retrieve": ("GET", get_car),
+    "add": ("POST", add_car),
+    "update": ("POST", update_car),
+    "delete": ("POST", delete_car),
+}
+
+
+@api_view(["POST"])
+@idempotent
+def run_batch(request):
+    """Run list of operations on cars in a single request and transaction.
+
+    Operations are run in order, by the views handling them separately. If any of
+    them fails, the changes of all of them are rolled back and the following ones
+    are not run.
+    """
+
+    serializer = BatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    status_code = status.HTTP_200_OK
+    with transaction.atomic():
+        for operation in serializer.validated_data["operations"]:
+            method, view = BATCH_OPERATIONS[operation["operation"]]
+            result = run_operation(
+                request, view, method, operation["params"], operation["data"]
+            )
+            results.append(result)
+            if result["status"] >= 400:
+                transaction.set_rollback(True)
+                status_code = result["status"]
+                break
+
+    return Response(
+        {"committed": status_code == status.HTTP_200_OK, "results": results},
+        status=status_code,
+    )
+
+
+@profiling_exempt
+@api_view(["GET"])
+def get_profile_samples(request):
+    """Get stacks sampled in requests since the last export, in collapsed format."""
+
+    if not is_profiling_allowed(request, request.headers.get("X-Profile")):
+        return HttpResponse(status=403)
+
+    return HttpResponse(stack_sampler.export(), content_type="text/plain")
+
+
 class WrongParamsException(Exception):
     pass
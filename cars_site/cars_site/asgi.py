@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cars_site.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up by get_asgi_application.
+from cars_app.sse import CarEventsApplication  # noqa: E402
+
+# Streams changes of cars at /car:events, other requests are handled by Django.
+application = CarEventsApplication(django_application)
@@ -31,7 +31,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    'cars_app',
+    'cars_app.apps.CarsAppConfig',
 
     'django.contrib.admin',
     'django.contrib.auth',
@@ -48,9 +48,19 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend'
     ),
+    # `format` query parameter selects the layout of car:list response.
+    'URL_FORMAT_OVERRIDE': None,
+    # Token buckets of the write endpoints, per client. None turns a limit off.
+    'DEFAULT_THROTTLE_RATES': {
+        'car_add': '600/min',
+        'car_update': '600/min',
+        'car_delete': '600/min',
+    },
 }
 
 MIDDLEWARE = [
+    'cars_app.middleware.ProfilingMiddleware',
+    'cars_app.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -129,3 +139,80 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Cars app
+
+# Directory for the file locks coalescing requests to the external vehicles API across
+# processes. The fetched results are shared through the cache, so a cache backend
+# common to all processes should be configured along with it.
+CARS_INFO_API_LOCK_DIR = os.environ.get('CARS_INFO_API_LOCK_DIR')
+CARS_INFO_API_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Manufacturers whose models are preloaded from the external vehicles API, in addition
+# to manufacturers of the existing cars, by `warm_catalog` command and on startup.
+CARS_CATALOG_MANUFACTURERS = [
+    manufacturer.strip()
+    for manufacturer in os.environ.get('CARS_CATALOG_MANUFACTURERS', '').split(',')
+    if manufacturer.strip()
+]
+CARS_WARM_CATALOG_ON_STARTUP = os.environ.get('CARS_WARM_CATALOG_ON_STARTUP') == '1'
+CARS_WARM_CATALOG_WORKERS = 8
+
+# Maximum number of writes handled concurrently by a process. Writes above it are
+# rejected with 429 status and Retry-After header of CARS_WRITE_RETRY_AFTER seconds.
+CARS_MAX_CONCURRENT_WRITES = 16
+CARS_WRITE_RETRY_AFTER = 1
+
+# Seconds for which responses of car:add and car:update requests with Idempotency-Key
+# header are kept, to be replayed for retries of the requests. They are stored in the
+# cache, so it should be common to all processes.
+CARS_IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# Seconds for which the key of a request being handled is taken. Retries with the key get
+# 409 status meanwhile. It should be about the timeout of requests, as a request whose
+# worker is killed, e.g. on timeout, doesn't release the key.
+CARS_IDEMPOTENCY_IN_PROGRESS_TTL = 60
+
+# Responses smaller than this many bytes are not compressed.
+CARS_COMPRESSION_MIN_SIZE = 1024
+
+# Number of cars fetched at once when car:list response is streamed.
+CARS_LIST_CHUNK_SIZE = 2000
+
+# Max number of cars returned by car:list with `limit` parameter.
+CARS_LIST_MAX_LIMIT = 1000
+
+# Min number of cars for which car:list with `count` and `approximate` parameters
+# returns an estimate of the query planner (on PostgreSQL only) instead of counting
+# the cars.
+CARS_APPROXIMATE_COUNT_MIN = 100000
+
+# Answer car:list filters from an in-memory snapshot of all cars when possible. Changes
+# made by other processes are visible after the snapshot is reloaded, at most
+# CARS_LIST_SNAPSHOT_MAX_AGE seconds later. That includes cars written by commands
+# (import_cars, generate_fleet, archive_cars), which run in their own processes, so
+# signals sent by them can't refresh the snapshot of the app.
+CARS_LIST_SNAPSHOT = os.environ.get('CARS_LIST_SNAPSHOT') == '1'
+CARS_LIST_SNAPSHOT_MAX_AGE = 60
+
+# Record changes of cars as events streamed by car:events endpoint (served by the ASGI
+# application only). Events are polled from the database every
+# CARS_EVENTS_POLL_INTERVAL seconds and kept for CARS_EVENTS_RETENTION seconds.
+CARS_EVENTS = os.environ.get('CARS_EVENTS') == '1'
+CARS_EVENTS_POLL_INTERVAL = 1
+CARS_EVENTS_RETENTION = 24 * 60 * 60
+
+# Maximum number of operations in a single car:batch request.
+CARS_BATCH_MAX_OPERATIONS = 100
+
+# Move deleted cars to the archive table instead of deleting them, so they can be
+# listed with car:archive.
+CARS_ARCHIVE = os.environ.get('CARS_ARCHIVE') == '1'
+
+# Token of clients allowed to profile requests with X-Profile header and to export the
+# sampled stacks (staff users are allowed without it). Stacks of the threads handling
+# requests are sampled every CARS_PROFILING_SAMPLE_INTERVAL seconds, if it's set.
+CARS_PROFILING_TOKEN = os.environ.get('CARS_PROFILING_TOKEN') or None
+CARS_PROFILING_SAMPLE_INTERVAL = float(
+    os.environ.get('CARS_PROFILING_SAMPLE_INTERVAL') or 0
+)
@@ -0,0 +1,57 @@
+"""
+Django settings of production workers serving only the cars API.
+
+Only apps and middleware used by the cars endpoints are loaded: there are no admin,
+sessions, messages, authentication, CSRF or templates. Select this profile with
+DJANGO_SETTINGS_MODULE=cars_site.settings_api.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REST_FRAMEWORK
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('CARS_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+INSTALLED_APPS = [
+    'cars_app.apps.CarsAppConfig',
+
+    'rest_framework',
+    'django_filters'
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
+
+MIDDLEWARE = [
+    'cars_app.middleware.ProfilingMiddleware',
+    'cars_app.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'cars_site.urls_api'
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+# Keep database connections open between requests.
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': 60,
+    }
+}
+
+USE_I18N = False
@@ -0,0 +1,6 @@
+"""cars_site URL Configuration of the API-only settings profile, without admin."""
+from django.urls import path, include
+
+urlpatterns = [
+    path('', include('cars_app.urls')),
+]